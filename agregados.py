@@ -0,0 +1,97 @@
+import bisect
+import numpy as np
+import pandas as pd
+
+# Agregados de ventas por día, producto y usuario, particionados por día ("YYYY-MM-DD").
+# El total del día, las series diarias del pronóstico y los reportes por período se leen de
+# aquí en lugar de recorrer todas las ventas. Al registrar una venta solo se actualiza la
+# partición de su día; los objetos no se modifican, cada cambio devuelve uno nuevo.
+COLUMNAS_PARTICION = ["ID", "Usuario", "Ventas", "Cantidad", "Total"]
+COLUMNAS_AGREGADOS = ["Día"] + COLUMNAS_PARTICION
+
+# Sumar filas de partición con el mismo producto y usuario
+def _sumar(partes):
+    partes = [p for p in partes if p is not None and not p.empty]
+    if len(partes) == 1:
+        return partes[0]
+    particion = pd.concat(partes, ignore_index=True)
+    return particion.groupby(["ID", "Usuario"], dropna=False, sort=False)[["Ventas", "Cantidad", "Total"]].sum().reset_index()
+
+# Resumen de una partición: (ventas, cantidad, total)
+def _resumir(particion):
+    return int(particion["Ventas"].sum()), int(particion["Cantidad"].sum()), round(float(particion["Total"].sum()), 2)
+
+class AgregadosVentas:
+    def __init__(self, particiones=None):
+        self.particiones = particiones or {}  # día -> dataframe con COLUMNAS_PARTICION
+        self.dias = sorted(self.particiones)  # Días ordenados para buscar rangos con bisect
+        self.resumenes = {dia: _resumir(particion) for dia, particion in self.particiones.items()}
+
+    # Construir desde una tabla ya agregada (columnas COLUMNAS_AGREGADOS, Día como texto)
+    @classmethod
+    def desde_tabla(cls, tabla):
+        if tabla.empty:
+            return cls()
+        tabla = tabla.astype({"ID": str})
+        return cls({dia: grupo[COLUMNAS_PARTICION].reset_index(drop=True) for dia, grupo in tabla.groupby("Día", sort=False)})
+
+    # Construir desde ventas individuales (columnas de VENTAS_COLUMNAS)
+    @classmethod
+    def desde_ventas(cls, ventas):
+        if ventas.empty:
+            return cls()
+        tabla = ventas.groupby(
+            [ventas["Fecha"].astype(str).str.slice(0, 10).rename("Día"), ventas["ID"].astype(str), "Usuario"], dropna=False
+        ).agg(Ventas=("Total", "size"), Cantidad=("Cantidad Vendida", "sum"), Total=("Total", "sum")).reset_index()
+        return cls.desde_tabla(tabla)
+
+    # Sumar otros agregados (p. ej. los de la cola recién compactada); solo se tocan sus días
+    def combinar(self, otros):
+        agregados = AgregadosVentas.__new__(AgregadosVentas)
+        agregados.particiones = dict(self.particiones)
+        agregados.resumenes = dict(self.resumenes)
+        for dia, particion in otros.particiones.items():
+            agregados.particiones[dia] = _sumar([agregados.particiones.get(dia), particion])
+            agregados.resumenes[dia] = _resumir(agregados.particiones[dia])
+        agregados.dias = sorted(agregados.particiones)
+        return agregados
+
+    # Agregar una venta (diccionario con las columnas de VENTAS_COLUMNAS)
+    def con_venta(self, venta):
+        dia = str(venta["Fecha"])[:10]
+        fila = pd.DataFrame({"ID": [str(venta["ID"])], "Usuario": [venta["Usuario"]], "Ventas": [1],
+                             "Cantidad": [int(venta["Cantidad Vendida"])], "Total": [float(venta["Total"])]})
+        agregados = AgregadosVentas.__new__(AgregadosVentas)
+        agregados.particiones = dict(self.particiones)
+        agregados.particiones[dia] = _sumar([self.particiones.get(dia), fila])
+        agregados.dias = self.dias if dia in self.resumenes else sorted(self.dias + [dia])
+        agregados.resumenes = dict(self.resumenes)
+        agregados.resumenes[dia] = _resumir(agregados.particiones[dia])
+        return agregados
+
+    # Días con ventas entre desde y hasta (incluidos; None = sin límite)
+    def dias_entre(self, desde=None, hasta=None):
+        inicio = bisect.bisect_left(self.dias, desde) if desde else 0
+        fin = bisect.bisect_right(self.dias, hasta) if hasta else len(self.dias)
+        return self.dias[inicio:fin]
+
+    # Filas agregadas de un período, con Día como fecha
+    def tabla(self, desde=None, hasta=None):
+        dias = self.dias_entre(desde, hasta)
+        if not dias:
+            return pd.DataFrame(columns=COLUMNAS_AGREGADOS)
+        partes = [self.particiones[dia] for dia in dias]
+        tabla = pd.concat(partes, ignore_index=True)
+        tabla.insert(0, "Día", np.repeat(pd.to_datetime(dias, format="%Y-%m-%d").to_numpy(), [len(p) for p in partes]))
+        return tabla
+
+    # Totales de un día: {"Ventas", "Cantidad", "Total"}
+    def resumen_dia(self, dia):
+        return dict(zip(["Ventas", "Cantidad", "Total"], self.resumenes.get(dia, (0, 0, 0.0))))
+
+    # Número total de ventas y último día con ventas
+    def numero_ventas(self):
+        return sum(resumen[0] for resumen in self.resumenes.values())
+
+    def ultimo_dia(self):
+        return self.dias[-1] if self.dias else ""
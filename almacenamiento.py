@@ -0,0 +1,907 @@
+import pandas as pd
+import numpy as np
+import os
+import csv
+import io
+import json
+import importlib.util
+import pickle
+import threading
+import functools
+import itertools
+from datetime import datetime, timedelta
+import shutil
+try:
+    import fcntl
+except ImportError:  # Windows: solo se bloquea entre hilos del mismo proceso
+    fcntl = None
+import base_datos
+import columnar
+from agregados import AgregadosVentas
+from instrumentacion import instrumentar, anotar, sumar
+
+# Motor de almacenamiento: "csv" (archivos planos), "parquet" (archivos columnares en
+# columnar.DIRECTORIO) o "sqlite" (ferreteria.db, transaccional)
+BACKEND = os.environ.get("FERRETERIA_BACKEND", "csv")
+
+# Archivo de inventario
+CSV_FILE = "inventario_ferreteria.csv"
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+
+# Tipos del inventario en memoria: categorías para las columnas con pocos valores distintos,
+# fechas reales y números compactos. Precio se mantiene en float64 porque son montos.
+TIPOS_INVENTARIO = {"Categoría": "category", "Cantidad": "int32", "Precio": "float64",
+                    "Proveedor": "category", "Demanda Estimada": "float32"}
+
+# Archivos de ventas: ventas.csv es la cola donde se anexan las ventas nuevas y el directorio
+# ventas_compactadas guarda el histórico ya compactado, un archivo por mes ordenado por fecha
+# (Parquet si está pyarrow, si no CSV comprimido). manifiesto.json dice qué archivos forman el
+# histórico y qué colas ya incluye; los agregados por día se guardan aparte, en un pickle que
+# es solo una caché: si no se puede leer se recalculan desde las ventas.
+VENTAS_CSV = "ventas.csv"
+VENTAS_COMPACTADAS_DIR = "ventas_compactadas"
+MANIFIESTO_FILE = os.path.join(VENTAS_COMPACTADAS_DIR, "manifiesto.json")
+EXTENSION_PARTICION = ".parquet" if importlib.util.find_spec("pyarrow") else ".csv.gz"
+VENTAS_COLUMNAS = ["Fecha", "ID", "Producto", "Cantidad Vendida", "Precio Unitario", "Total", "Usuario"]
+UMBRAL_COMPACTACION = 1024 * 1024  # Compactar cuando la cola supera 1 MB
+
+# Historial de cambios: registro de auditoría al que solo se anexan líneas
+HISTORIAL_CSV = "historial_cambios.csv"
+HISTORIAL_COLUMNAS = ["Fecha", "Acción", "ID Producto", "Usuario"]
+
+# En formato Parquet la cola de ventas y el historial van dentro de su propio directorio
+VENTAS_FILE = os.path.join(columnar.DIRECTORIO, VENTAS_CSV) if BACKEND == "parquet" else VENTAS_CSV
+HISTORIAL_FILE = os.path.join(columnar.DIRECTORIO, HISTORIAL_CSV) if BACKEND == "parquet" else HISTORIAL_CSV
+
+# Datos de demostración para inventario
+DEMO_DATA = pd.DataFrame({
+    "ID": ["001", "002", "003", "004", "005"],
+    "Producto": ["Taladro Eléctrico", "Pintura Blanca", "Tornillos 1/4", "Martillo", "Cable 10m"],
+    "Categoría": ["Herramientas", "Pinturas", "Materiales", "Herramientas", "Electricidad"],
+    "Cantidad": [10, 5, 100, 8, 15],
+    "Precio": [150.50, 25.75, 0.10, 12.00, 8.90],
+    "Proveedor": ["Bosch", "Sherwin", "Genérico", "Truper", "Voltex"],
+    "Última Actualización": ["2025-03-02 10:00:00", "2025-03-01 15:30:00", "2025-02-28 09:15:00", 
+                            "2025-03-01 12:00:00", "2025-03-02 14:20:00"],
+    "Demanda Estimada": [0.0, 0.0, 0.0, 0.0, 0.0]
+})
+
+# Datos de demostración para ventas históricas (30 días)
+fecha_inicio = datetime(2025, 2, 1)
+DEMO_VENTAS = []
+for i in range(30):
+    fecha = fecha_inicio + timedelta(days=i)
+    DEMO_VENTAS.extend([
+        {"Fecha": fecha.strftime("%Y-%m-%d 09:00:00"), "ID": "001", "Producto": "Taladro Eléctrico", "Cantidad Vendida": 2, "Precio Unitario": 150.50, "Total": 301.00, "Usuario": "admin"},
+        {"Fecha": fecha.strftime("%Y-%m-%d 10:00:00"), "ID": "002", "Producto": "Pintura Blanca", "Cantidad Vendida": 1, "Precio Unitario": 25.75, "Total": 25.75, "Usuario": "admin"},
+        {"Fecha": fecha.strftime("%Y-%m-%d 11:00:00"), "ID": "003", "Producto": "Tornillos 1/4", "Cantidad Vendida": 10, "Precio Unitario": 0.10, "Total": 1.00, "Usuario": "admin"},
+        {"Fecha": fecha.strftime("%Y-%m-%d 12:00:00"), "ID": "004", "Producto": "Martillo", "Cantidad Vendida": 1, "Precio Unitario": 12.00, "Total": 12.00, "Usuario": "admin"},
+        {"Fecha": fecha.strftime("%Y-%m-%d 13:00:00"), "ID": "005", "Producto": "Cable 10m", "Cantidad Vendida": 3, "Precio Unitario": 8.90, "Total": 26.70, "Usuario": "admin"}
+    ])
+DEMO_VENTAS = pd.DataFrame(DEMO_VENTAS)
+
+# Las escrituras (ventas, compactación, inventario, historial) se hacen de a una: un lock entre
+# hilos y, donde hay fcntl, un bloqueo de archivo entre procesos (p. ej. la app y la línea de
+# comandos). Sin esto, una venta anexada mientras se compacta puede caer en la cola que se está
+# integrando después de leerla y perderse al borrarla.
+BLOQUEO_FILE = ".ferreteria.lock"
+_escritura_lock = threading.RLock()
+_bloqueo = {"archivo": None, "profundidad": 0}
+
+def _exclusivo(funcion):
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with _escritura_lock:
+            if _bloqueo["profundidad"] == 0 and fcntl is not None:
+                _bloqueo["archivo"] = open(BLOQUEO_FILE, "a")
+                fcntl.flock(_bloqueo["archivo"], fcntl.LOCK_EX)
+            _bloqueo["profundidad"] += 1
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                _bloqueo["profundidad"] -= 1
+                if _bloqueo["profundidad"] == 0 and _bloqueo["archivo"] is not None:
+                    _bloqueo["archivo"].close()  # Cerrar el archivo libera el bloqueo
+                    _bloqueo["archivo"] = None
+    return envoltura
+
+_sqlite_preparado = False
+_parquet_preparado = False
+
+# Caché de cargas compartida entre sesiones: {clave: (firma de los archivos, dataframe)}
+_cache = {}
+_cache_lock = threading.Lock()
+_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3
+
+# Firma de los archivos de una carga: cambia cuando se modifican (mtime) o crecen (tamaño)
+def _firma(rutas):
+    firma = []
+    for ruta in rutas:
+        try:
+            estado = os.stat(ruta)
+            firma.append((ruta, estado.st_mtime_ns, estado.st_size))
+        except FileNotFoundError:
+            firma.append((ruta, None, None))
+    return tuple(firma)
+
+# Bytes de los archivos indicados (en un directorio, la suma de sus archivos)
+def _bytes(rutas):
+    total = 0
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            total += sum(entrada.stat().st_size for entrada in os.scandir(ruta) if entrada.is_file() and not entrada.name.startswith("."))
+        elif os.path.exists(ruta):
+            total += os.path.getsize(ruta)
+    return total
+
+def _rutas(clave):
+    if BACKEND == "sqlite":
+        return [base_datos.DB_FILE, f"{base_datos.DB_FILE}-wal"]
+    if clave.split(":")[0] == "inventario":  # También "inventario:<columnas>" (proyecciones)
+        return [columnar.INVENTARIO_FILE if BACKEND == "parquet" else CSV_FILE]
+    if clave == "compactadas":
+        return [MANIFIESTO_FILE]
+    return [VENTAS_FILE, columnar.VENTAS_DIR if BACKEND == "parquet" else VENTAS_COMPACTADAS_DIR]
+
+# Devolver el dataframe en caché si los archivos no cambiaron; si no, cargarlo de nuevo.
+# Se entrega una vista: con copy-on-write (pandas >= 3) modificarla no altera la caché.
+# Los agregados de ventas no se modifican en el lugar, así que se entregan tal cual.
+def _cargar_con_cache(clave, cargador):
+    firma = _firma(_rutas(clave))
+    with _cache_lock:
+        entrada = _cache.get(clave)
+    if entrada is None or entrada[0] != firma:
+        datos = cargador()
+        anotar(cache="fallo")
+        if BACKEND != "sqlite" and clave != "agregados":  # Los agregados solo leen una parte de los archivos
+            anotar(bytes_leidos=_bytes(_rutas(clave)))
+        if isinstance(datos, pd.DataFrame):
+            datos.attrs["version"] = (clave, firma)  # Identifica esta carga (p. ej. para el índice de búsqueda)
+        entrada = (firma, datos)
+        with _cache_lock:
+            _cache[clave] = entrada
+    else:
+        anotar(cache="acierto")
+    if isinstance(entrada[1], pd.DataFrame):
+        return entrada[1].copy(deep=not _COPY_ON_WRITE)
+    return entrada[1]
+
+# Descartar cargas en caché (todas si no se indica clave); lo llaman las funciones que guardan.
+# Descartar "inventario" descarta también sus proyecciones ("inventario:<columnas>").
+def invalidar_cache(*claves):
+    with _cache_lock:
+        for clave in list(_cache):
+            if not claves or clave.split(":")[0] in claves:
+                _cache.pop(clave, None)
+
+# Base SQLite lista para usar; la primera vez migra los CSV existentes si está vacía
+def _sqlite():
+    if not _sqlite_preparado:
+        _preparar_sqlite()
+    return base_datos
+
+# Con el bloqueo de escritura y volviendo a mirar si está vacía: otro hilo u otro proceso pudo
+# haber migrado mientras se esperaba, y migrar dos veces duplicaría el historial
+@_exclusivo
+def _preparar_sqlite():
+    global _sqlite_preparado
+    if not _sqlite_preparado:
+        if base_datos.esta_vacia():
+            migrar_csv_a_sqlite()
+        _sqlite_preparado = True
+
+# Migrar inventario, ventas e historial desde los archivos CSV a la base SQLite
+def migrar_csv_a_sqlite():
+    base_datos.guardar_inventario(_cargar_inventario_csv())
+    base_datos.guardar_ventas(_cargar_ventas_csv())
+    if os.path.exists(HISTORIAL_FILE):
+        historial = pd.read_csv(HISTORIAL_FILE, dtype={"ID Producto": str})
+        base_datos.registrar_cambios(historial[HISTORIAL_COLUMNAS].values.tolist())
+
+# Archivos Parquet listos para usar; la primera vez migra los archivos CSV existentes
+def _parquet():
+    if not _parquet_preparado:
+        _preparar_parquet()
+    return columnar
+
+# Igual que en SQLite: con el bloqueo de escritura y volviendo a mirar si ya hay inventario
+@_exclusivo
+def _preparar_parquet():
+    global _parquet_preparado
+    if not _parquet_preparado:
+        if not columnar.hay_inventario():
+            migrar_csv_a_parquet()
+        _parquet_preparado = True
+
+# Migrar a Parquet: el inventario y el histórico compactado se convierten; la cola de ventas,
+# las colas pendientes y el historial se copian. Los archivos CSV originales no se modifican.
+def migrar_csv_a_parquet():
+    os.makedirs(columnar.DIRECTORIO, exist_ok=True)
+    if os.path.exists(MANIFIESTO_FILE):
+        ventas, lotes, agregados = _leer_particiones_compactadas()
+        columnar.escribir_lote("0" * 20, ventas, _tabla_agregados(agregados))  # Lote que queda primero al ordenar
+        for nombre in os.listdir("."):
+            if nombre.startswith(f"{VENTAS_CSV}.") and nombre.endswith(".compactando") and _lote_de(nombre) not in lotes:
+                shutil.copyfile(nombre, os.path.join(columnar.DIRECTORIO, nombre))
+    for origen, destino in ((VENTAS_CSV, VENTAS_FILE), (HISTORIAL_CSV, HISTORIAL_FILE)):
+        if os.path.exists(origen):
+            shutil.copyfile(origen, destino)
+    columnar.guardar_inventario(_cargar_inventario_csv())  # Al final: su existencia marca la migración como hecha
+
+# Convertir un inventario (leído de CSV, SQLite o importado) a los tipos de TIPOS_INVENTARIO
+def tipar_inventario(df):
+    df = df.copy()
+    if "Demanda Estimada" not in df.columns:
+        df["Demanda Estimada"] = 0.0
+    df["ID"] = df["ID"].astype(str)
+    df["Cantidad"] = pd.to_numeric(df["Cantidad"]).fillna(0)
+    df["Precio"] = pd.to_numeric(df["Precio"]).round(2)
+    df["Demanda Estimada"] = pd.to_numeric(df["Demanda Estimada"]).fillna(0.0).round(2)
+    df["Última Actualización"] = pd.to_datetime(df["Última Actualización"], format="ISO8601", errors="coerce")
+    return df.astype(TIPOS_INVENTARIO)
+
+def _cargar_inventario_csv():
+    if not os.path.exists(CSV_FILE):
+        DEMO_DATA.to_csv(CSV_FILE, index=False)
+        return tipar_inventario(DEMO_DATA)
+    return tipar_inventario(pd.read_csv(CSV_FILE, dtype={"ID": str}))
+
+# Función para cargar inventario; con columnas se devuelven solo esas (en Parquet, sin leer las demás)
+@instrumentar()
+def cargar_inventario(columnas=None):
+    if columnas is not None:
+        return _columnas_inventario(list(columnas))
+    if BACKEND == "sqlite":
+        return _cargar_con_cache("inventario", lambda: tipar_inventario(_sqlite().cargar_inventario()))
+    if BACKEND == "parquet":
+        return _cargar_con_cache("inventario", lambda: tipar_inventario(_parquet().cargar_inventario()))
+    return _cargar_con_cache("inventario", _cargar_inventario_csv)
+
+# Algunas columnas del inventario: si el inventario completo está en caché y al día se toman de ahí;
+# si no, en Parquet se leen solo esas columnas y la proyección queda en caché con su propia clave.
+# La versión (attrs) es la misma en ambos casos para que las cachés que dependen de ella no cambien.
+def _columnas_inventario(columnas):
+    clave = "inventario:" + ",".join(columnas)
+    with _cache_lock:
+        entrada = _cache.get("inventario")
+    if BACKEND != "parquet" or (entrada is not None and entrada[0] == _firma(_rutas("inventario"))):
+        completo = cargar_inventario()
+        df = completo[columnas]
+        df.attrs["version"] = (clave, completo.attrs["version"][1])
+        return df
+    return _cargar_con_cache(clave, lambda: _proyectar_parquet(columnas))
+
+def _proyectar_parquet(columnas):
+    df = _parquet().cargar_inventario(columnas)
+    return df.astype({col: tipo for col, tipo in TIPOS_INVENTARIO.items() if col in df.columns})
+
+_indices_ids = {}
+
+# Índice ID -> fila (tabla hash) del inventario. Con el inventario de la caché de carga se
+# construye una sola vez por versión.
+def indice_ids(inventario):
+    clave = (inventario.attrs.get("version"), len(inventario))
+    # Un solo acceso al diccionario: otros hilos lo vacían al cambiar de versión
+    guardado = _indices_ids.get(clave) if clave[0] is not None else None
+    if guardado is not None:
+        return guardado
+    indice = pd.Index(inventario["ID"])
+    if clave[0] is not None:
+        _indices_ids.clear()  # Solo interesa la versión vigente
+        _indices_ids[clave] = indice
+    return indice
+
+# Posición de un producto en el inventario (None si no existe), sin recorrer la columna ID
+def posicion_producto(inventario, id_producto):
+    posiciones = indice_ids(inventario).get_indexer_for([id_producto])
+    posicion = int(posiciones[0]) if len(posiciones) else -1
+    if posicion >= 0 and inventario["ID"].iat[posicion] != id_producto:
+        # El dataframe se reordenó después de cargarlo: se busca con un índice propio
+        posiciones = pd.Index(inventario["ID"]).get_indexer_for([id_producto])
+        posicion = int(posiciones[0]) if len(posiciones) else -1
+    return posicion if posicion >= 0 else None
+
+# Fila de un producto por ID, o None si no existe
+def fila_producto(inventario, id_producto):
+    posicion = posicion_producto(inventario, id_producto)
+    return None if posicion is None else inventario.iloc[posicion]
+
+# Asignar valores a la fila de un producto respetando los tipos (categorías nuevas, fechas)
+def _asignar(inventario, posicion, valores):
+    for columna, valor in valores.items():
+        if isinstance(inventario[columna].dtype, pd.CategoricalDtype):
+            if pd.notna(valor) and valor not in inventario[columna].cat.categories:
+                inventario[columna] = inventario[columna].cat.add_categories([valor])
+        elif pd.api.types.is_datetime64_any_dtype(inventario[columna]):
+            valor = pd.Timestamp(valor)
+        inventario.iat[posicion, inventario.columns.get_loc(columna)] = valor
+
+# Función para guardar inventario
+@instrumentar()
+@_exclusivo
+def guardar_inventario(df):
+    df["Precio"] = df["Precio"].round(2)
+    df["Demanda Estimada"] = df["Demanda Estimada"].round(2)
+    if BACKEND == "sqlite":
+        _sqlite().guardar_inventario(df)
+    elif BACKEND == "parquet":
+        _parquet().guardar_inventario(tipar_inventario(df))
+    else:
+        df.to_csv(CSV_FILE, index=False, date_format=FORMATO_FECHA)
+    if BACKEND != "sqlite":
+        anotar(filas=len(df), bytes_escritos=_bytes(_rutas("inventario")))
+    invalidar_cache("inventario")
+
+# Combinar una entrega con el inventario: suma cantidades a los IDs existentes (y opcionalmente
+# actualiza sus precios) y agrega los IDs nuevos. Devuelve (inventario, IDs existentes, IDs nuevos).
+def fusionar_reabastecimiento(inventario, entrega, actualizar_precios=False):
+    posiciones = pd.Index(inventario["ID"]).get_indexer(entrega["ID"])
+    existe = posiciones >= 0
+    fusionado = inventario.reset_index(drop=True)
+    cantidades = fusionado["Cantidad"].to_numpy(dtype="int64", copy=True)
+    cantidades[posiciones[existe]] += entrega["Cantidad"].to_numpy(dtype="int64")[existe]
+    fusionado["Cantidad"] = cantidades
+    if actualizar_precios:
+        precios = fusionado["Precio"].to_numpy(dtype=float, copy=True)
+        precios[posiciones[existe]] = entrega["Precio"].to_numpy(dtype=float)[existe]
+        fusionado["Precio"] = precios
+    fusionado.loc[posiciones[existe], "Última Actualización"] = pd.Timestamp.now().floor("s")
+    nuevos = entrega[~existe]
+    fusionado = tipar_inventario(pd.concat([fusionado, nuevos[fusionado.columns]], ignore_index=True))
+    return fusionado, entrega["ID"][existe].tolist(), nuevos["ID"].tolist()
+
+# Reabastecer: aplica una entrega completa con una sola escritura del inventario y una del historial.
+# Devuelve (IDs existentes reabastecidos, IDs nuevos agregados).
+@instrumentar()
+@_exclusivo
+def reabastecer(entrega, usuario, actualizar_precios=False):
+    if BACKEND == "sqlite":
+        ids_existentes, ids_nuevos = _sqlite().reabastecer(entrega, usuario, actualizar_precios,
+                                                           datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        invalidar_cache("inventario")
+        return ids_existentes, ids_nuevos
+    inventario, ids_existentes, ids_nuevos = fusionar_reabastecimiento(cargar_inventario(), entrega, actualizar_precios)
+    guardar_inventario(inventario)
+    registrar_cambios([("Reabastecer", id_prod, usuario) for id_prod in ids_existentes] +
+                      [("Agregar", id_prod, usuario) for id_prod in ids_nuevos])
+    return ids_existentes, ids_nuevos
+
+# Actualizar un producto; valores es un diccionario {columna: valor}
+@instrumentar()
+@_exclusivo
+def actualizar_producto(id_producto, valores):
+    if BACKEND == "sqlite":
+        _sqlite().actualizar_producto(id_producto, valores)
+        invalidar_cache("inventario")
+        return
+    inventario = cargar_inventario()
+    posicion = posicion_producto(inventario, id_producto)
+    if posicion is not None:
+        _asignar(inventario, posicion, valores)
+        guardar_inventario(inventario)
+
+@instrumentar()
+@_exclusivo
+def eliminar_producto(id_producto):
+    if BACKEND == "sqlite":
+        _sqlite().eliminar_producto(id_producto)
+        invalidar_cache("inventario")
+        return
+    inventario = cargar_inventario()
+    posicion = posicion_producto(inventario, id_producto)
+    if posicion is not None:
+        guardar_inventario(inventario.drop(index=inventario.index[posicion]))
+
+# Guardar la demanda estimada ({ID: demanda}) sin tocar stock ni precios
+@instrumentar()
+@_exclusivo
+def actualizar_demanda(demandas):
+    if BACKEND == "sqlite":
+        _sqlite().actualizar_demanda(demandas)
+        invalidar_cache("inventario")
+        return
+    inventario = cargar_inventario()
+    inventario["Demanda Estimada"] = inventario["ID"].map(demandas).fillna(inventario["Demanda Estimada"])
+    guardar_inventario(inventario)
+
+# Vender un producto: descuenta stock, registra la venta y el historial.
+# Devuelve la venta registrada o lanza ValueError si el ID no existe o falta stock.
+def vender_producto(id_producto, cantidad, usuario):
+    return vender_productos([(id_producto, cantidad)], usuario)[0]
+
+# Vender varios productos en una sola operación; ventas es una lista de (ID, cantidad).
+# Se valida todo antes de escribir: si un ID no existe o falta stock se lanza ValueError y no
+# se vende nada. El inventario se guarda una vez y las ventas se anexan juntas.
+@instrumentar()
+@_exclusivo
+def vender_productos(ventas, usuario):
+    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    ventas = [(str(id_producto), int(cantidad)) for id_producto, cantidad in ventas]
+    if any(cantidad <= 0 for _, cantidad in ventas):
+        raise ValueError("La cantidad vendida debe ser mayor que cero.")
+    if BACKEND == "sqlite":
+        registradas = _sqlite().vender(ventas, usuario, fecha)
+        invalidar_cache("inventario", "ventas", "agregados")
+        return registradas
+    inventario = cargar_inventario()  # La caché se valida contra el archivo, así que no está desactualizado
+    pedidas = {}
+    for id_producto, cantidad in ventas:
+        pedidas[id_producto] = pedidas.get(id_producto, 0) + cantidad
+    posiciones = {}
+    for id_producto, cantidad in pedidas.items():
+        posicion = posicion_producto(inventario, id_producto)
+        if posicion is None:
+            raise ValueError(f"El ID '{id_producto}' no se encontró en el inventario.")
+        disponible = inventario["Cantidad"].iat[posicion]
+        if disponible < cantidad:
+            raise ValueError(f"No hay suficiente stock de '{id_producto}'. Disponible: {disponible}")
+        posiciones[id_producto] = posicion
+    for id_producto, cantidad in pedidas.items():
+        posicion = posiciones[id_producto]
+        _asignar(inventario, posicion, {"Cantidad": inventario["Cantidad"].iat[posicion] - cantidad, "Última Actualización": fecha})
+    guardar_inventario(inventario)
+    registradas = registrar_ventas([(fecha, id_producto, inventario["Producto"].iat[posiciones[id_producto]], cantidad,
+                                     inventario["Precio"].iat[posiciones[id_producto]], usuario) for id_producto, cantidad in ventas])
+    registrar_cambios([("Venta", id_producto, usuario) for id_producto, _ in ventas])
+    return registradas
+
+# Nombre del archivo temporal donde se mueve la cola mientras se compacta
+def _archivo_compactando(lote):
+    return f"{VENTAS_FILE}.{lote}.compactando"
+
+# Lote de una cola movida, a partir de su nombre de archivo
+def _lote_de(ruta):
+    return os.path.basename(ruta)[len(os.path.basename(VENTAS_FILE)) + 1:-len(".compactando")]
+
+# Leer la cola de ventas (solo las filas anexadas desde la última compactación)
+def _leer_cola(ruta):
+    if not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+        return pd.DataFrame(columns=VENTAS_COLUMNAS)
+    return pd.read_csv(ruta, dtype={"ID": str})
+
+# Leer el histórico compactado: devuelve (ventas, lotes de cola ya incluidos, agregados).
+# Con con_ventas=False solo se leen el encabezado y los agregados (ventas es None).
+def _leer_compactadas(con_ventas=True):
+    if BACKEND == "parquet":
+        lotes = _parquet().lotes()
+        tabla = columnar.cargar_agregados(lotes)
+        agregados = AgregadosVentas() if tabla is None else AgregadosVentas.desde_tabla(tabla)
+        return (columnar.cargar_ventas() if con_ventas else None), lotes, agregados
+    return _leer_particiones_compactadas(con_ventas)
+
+# Todavía no hay ventas guardadas (ni cola ni histórico compactado)
+def _sin_ventas():
+    if BACKEND == "parquet":
+        return not os.path.exists(VENTAS_FILE) and not _parquet().lotes()
+    return not os.path.exists(VENTAS_FILE) and not os.path.exists(MANIFIESTO_FILE)
+
+def _leer_manifiesto():
+    if not os.path.exists(MANIFIESTO_FILE):
+        return {"lotes": [], "particiones": {}, "agregados": None}
+    with open(MANIFIESTO_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+def _leer_particion(nombre):
+    ruta = os.path.join(VENTAS_COMPACTADAS_DIR, nombre)
+    if nombre.endswith(".parquet"):
+        return pd.read_parquet(ruta)
+    return pd.read_csv(ruta, dtype={"ID": str})
+
+# Ventas de todas las particiones del manifiesto, en orden de fecha
+def _ventas_compactadas(manifiesto):
+    partes = [_leer_particion(manifiesto["particiones"][mes]) for mes in sorted(manifiesto["particiones"])]
+    if not partes:
+        return pd.DataFrame(columns=VENTAS_COLUMNAS)
+    return _normalizar_ventas(pd.concat(partes, ignore_index=True))
+
+# Agregados del histórico compactado; si la caché falta o es de otra versión de pandas se recalculan
+def _agregados_compactados(manifiesto):
+    if manifiesto["agregados"]:
+        try:
+            with open(os.path.join(VENTAS_COMPACTADAS_DIR, manifiesto["agregados"]), "rb") as f:
+                return AgregadosVentas(pickle.load(f))
+        except FileNotFoundError:
+            raise  # Otra compactación la reemplazó: la lectura se repite
+        except Exception:  # pickle de otra versión: cualquier error al cargarlo
+            pass
+    return AgregadosVentas.desde_ventas(_ventas_compactadas(manifiesto))
+
+def _leer_particiones_compactadas(con_ventas=True):
+    manifiesto = _leer_manifiesto()
+    ventas = _ventas_compactadas(manifiesto) if con_ventas else None
+    return ventas, set(manifiesto["lotes"]), _agregados_compactados(manifiesto)
+
+# Agregados como tabla con el día en texto, para guardarlos en Parquet
+def _tabla_agregados(agregados):
+    tabla = agregados.tabla()
+    return tabla.assign(Día=tabla["Día"].dt.strftime("%Y-%m-%d"))
+
+def _escribir_archivo_compactado(nombre, escribir):
+    os.makedirs(VENTAS_COMPACTADAS_DIR, exist_ok=True)
+    ruta = os.path.join(VENTAS_COMPACTADAS_DIR, nombre)
+    tmp = os.path.join(VENTAS_COMPACTADAS_DIR, f".{nombre}.tmp")
+    escribir(tmp)
+    os.replace(tmp, ruta)
+    sumar(bytes_escritos=os.path.getsize(ruta))
+
+# Escribir el histórico compactado. meses son las ventas nuevas o reescritas de cada mes
+# ("YYYY-MM"); particiones, los archivos de los meses que no cambian. Cada escritura usa nombres
+# nuevos y el manifiesto se reemplaza al final de forma atómica: hasta ese momento las lecturas
+# ven el histórico anterior completo. Después se borran los archivos que ya no están en él.
+def _escribir_compactadas(meses, particiones, lotes, agregados):
+    version = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    particiones = dict(particiones)
+    for mes, ventas in meses.items():
+        ventas = ventas[VENTAS_COLUMNAS].sort_values("Fecha", kind="stable").reset_index(drop=True)
+        nombre = f"{mes}.{version}{EXTENSION_PARTICION}"
+        if EXTENSION_PARTICION == ".parquet":
+            _escribir_archivo_compactado(nombre, lambda tmp: ventas.astype(columnar.TIPOS_VENTAS).to_parquet(tmp, index=False))
+        else:
+            _escribir_archivo_compactado(nombre, lambda tmp: ventas.to_csv(tmp, index=False, compression="gzip"))
+        particiones[mes] = nombre
+
+    def escribir_agregados(tmp):
+        with open(tmp, "wb") as f:
+            pickle.dump(agregados.particiones, f, protocol=pickle.HIGHEST_PROTOCOL)
+    nombre_agregados = f"agregados.{version}.pkl"
+    _escribir_archivo_compactado(nombre_agregados, escribir_agregados)
+
+    def escribir_manifiesto(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"lotes": sorted(lotes), "particiones": particiones, "agregados": nombre_agregados}, indent=1))
+    _escribir_archivo_compactado(os.path.basename(MANIFIESTO_FILE), escribir_manifiesto)
+    vigentes = set(particiones.values()) | {nombre_agregados, os.path.basename(MANIFIESTO_FILE)}
+    for nombre in os.listdir(VENTAS_COMPACTADAS_DIR):
+        if nombre not in vigentes:
+            os.remove(os.path.join(VENTAS_COMPACTADAS_DIR, nombre))
+
+# Ventas compactadas de un día ("YYYY-MM-DD"): solo se lee el archivo de su mes. El mes leído y
+# las ventas de cada día se guardan en compactadas (manifiesto en caché) hasta que una
+# compactación cambie el manifiesto.
+def _compactadas_del_dia(compactadas, dia):
+    if dia not in compactadas["dias"]:
+        mes = dia[:7]
+        if mes not in compactadas["meses"]:
+            nombre = compactadas["manifiesto"]["particiones"].get(mes)
+            compactadas["meses"][mes] = pd.DataFrame(columns=VENTAS_COLUMNAS) if nombre is None else _leer_particion(nombre)
+        ventas = compactadas["meses"][mes]
+        compactadas["dias"][dia] = ventas[ventas["Fecha"].astype(str).str.startswith(dia)].reset_index(drop=True)
+    return compactadas["dias"][dia]
+
+# Ventas separadas por mes ("YYYY-MM")
+def _por_mes(ventas):
+    return dict(tuple(ventas.groupby(ventas["Fecha"].astype(str).str.slice(0, 7), sort=True)))
+
+# Colas movidas a .compactando (por la compactación en curso o por una que no terminó)
+def _colas_movidas():
+    prefijo = f"{os.path.basename(VENTAS_FILE)}."
+    directorio = os.path.dirname(VENTAS_FILE) or "."
+    return [os.path.join(directorio, nombre) for nombre in sorted(os.listdir(directorio))
+            if nombre.startswith(prefijo) and nombre.endswith(".compactando")]
+
+# Colas movidas que todavía no están en el histórico compactado. No borra nada: lo llaman
+# también las lecturas, que no toman el bloqueo.
+def _colas_pendientes(lotes_incluidos):
+    return [ruta for ruta in _colas_movidas() if _lote_de(ruta) not in lotes_incluidos]
+
+# Borrar las colas que ya están en el histórico compactado (solo con el bloqueo de escritura)
+def _borrar_colas_incluidas(lotes_incluidos):
+    for ruta in _colas_movidas():
+        if _lote_de(ruta) in lotes_incluidos:
+            os.remove(ruta)
+
+# Las lecturas de ventas no toman el bloqueo: si una compactación mueve o borra archivos mientras
+# se leen (o cambian entre el inicio y el fin de la lectura) se vuelve a leer, y el último
+# intento se hace con el bloqueo tomado.
+REINTENTOS_LECTURA = 5
+
+def _firma_lectura():
+    return _firma(_rutas("ventas") + [os.path.dirname(VENTAS_FILE) or "."])
+
+def _leer_consistente(lector):
+    for _ in range(REINTENTOS_LECTURA):
+        antes = _firma_lectura()
+        try:
+            datos = lector()
+        except (FileNotFoundError, pd.errors.EmptyDataError, pd.errors.ParserError):
+            continue
+        if _firma_lectura() == antes:
+            return datos
+    return _exclusivo(lector)()
+
+# Crear las ventas de demostración si todavía no hay ninguna
+@_exclusivo
+def _crear_ventas_demo():
+    if _sin_ventas():
+        _guardar_ventas_csv(DEMO_VENTAS.copy())
+
+def _normalizar_ventas(df):
+    df = df.reset_index(drop=True)
+    df["ID"] = df["ID"].astype(str)
+    df["Precio Unitario"] = df["Precio Unitario"].astype(float).round(2)
+    df["Total"] = df["Total"].astype(float).round(2)
+    return df
+
+# Función para cargar ventas
+@instrumentar()
+def cargar_ventas():
+    if BACKEND == "sqlite":
+        return _cargar_con_cache("ventas", lambda: _sqlite().cargar_ventas())
+    return _cargar_con_cache("ventas", _cargar_ventas_csv)
+
+# Ventas en CSV: histórico compactado + colas pendientes + cola actual
+def _cargar_ventas_csv():
+    if _sin_ventas():
+        _crear_ventas_demo()
+    return _leer_consistente(_leer_ventas_csv)
+
+def _leer_ventas_csv():
+    compactadas, lotes, _ = _leer_compactadas()
+    partes = [compactadas] + [_leer_cola(ruta) for ruta in _colas_pendientes(lotes)] + [_leer_cola(VENTAS_FILE)]
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame(columns=VENTAS_COLUMNAS)
+    return _normalizar_ventas(pd.concat(partes, ignore_index=True))
+
+# Agregados de ventas por día, producto y usuario (ver agregados.py)
+@instrumentar()
+def cargar_agregados():
+    if BACKEND == "sqlite":
+        return _cargar_con_cache("agregados", lambda: AgregadosVentas.desde_tabla(_sqlite().cargar_agregados()))
+    return _cargar_con_cache("agregados", _cargar_agregados_csv)
+
+# Agregados en CSV: los del histórico compactado más los de las colas, sin leer las ventas compactadas
+def _cargar_agregados_csv():
+    if _sin_ventas():
+        _crear_ventas_demo()
+    return _leer_consistente(_leer_agregados_csv)
+
+def _leer_agregados_csv():
+    _, lotes, agregados = _leer_compactadas(con_ventas=False)
+    colas = [_leer_cola(ruta) for ruta in _colas_pendientes(lotes)] + [_leer_cola(VENTAS_FILE)]
+    colas = [c for c in colas if not c.empty]
+    if colas:
+        agregados = agregados.combinar(AgregadosVentas.desde_ventas(_normalizar_ventas(pd.concat(colas, ignore_index=True))))
+    return agregados
+
+# Ventas con fecha entre los días desde (incluido) y hasta (excluido), "YYYY-MM-DD".
+# En SQLite se usa el índice por fecha y en Parquet solo se leen los grupos de filas del rango.
+@instrumentar()
+def ventas_entre(desde, hasta):
+    if BACKEND == "sqlite":
+        return _sqlite().ventas_entre(desde, hasta)
+    if BACKEND == "parquet":
+        ventas = _leer_consistente(lambda: _ventas_parquet_entre(desde, hasta))
+    else:
+        ventas = cargar_ventas()
+    fechas = ventas["Fecha"].astype(str)
+    return ventas[(fechas >= desde) & (fechas < hasta)].reset_index(drop=True)
+
+def _ventas_parquet_entre(desde, hasta):
+    partes = [_parquet().cargar_ventas(desde=desde, hasta=hasta)]
+    partes += [_leer_cola(ruta) for ruta in _colas_pendientes(columnar.lotes())] + [_leer_cola(VENTAS_FILE)]
+    partes = [p for p in partes if not p.empty]
+    return _normalizar_ventas(pd.concat(partes, ignore_index=True)) if partes else pd.DataFrame(columns=VENTAS_COLUMNAS)
+
+# Ventas individuales de un día ("YYYY-MM-DD")
+@instrumentar()
+def ventas_del_dia(dia):
+    siguiente = (datetime.strptime(dia, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    if BACKEND == "sqlite":
+        return ventas_entre(dia, siguiente)
+    esperadas = cargar_agregados().resumen_dia(dia)["Ventas"]
+    return _leer_consistente(lambda: _ventas_del_dia_csv(dia, siguiente, esperadas))
+
+def _ventas_del_dia_csv(dia, siguiente, esperadas):
+    # Las ventas del día suelen estar todas en la cola; los agregados dicen cuántas son
+    cola = _normalizar_ventas(_leer_cola(VENTAS_FILE))
+    del_dia = cola[cola["Fecha"].astype(str).str.startswith(dia)]
+    if len(del_dia) == esperadas:
+        return del_dia.reset_index(drop=True)
+    if BACKEND == "parquet":
+        return ventas_entre(dia, siguiente)
+    # Después de una compactación: las del día en el archivo de su mes, colas pendientes y cola
+    compactadas = _cargar_con_cache("compactadas", lambda: {"manifiesto": _leer_manifiesto(), "meses": {}, "dias": {}})
+    pendientes = _colas_pendientes(set(compactadas["manifiesto"]["lotes"]))
+    partes = [_compactadas_del_dia(compactadas, dia)] + [_leer_cola(ruta) for ruta in pendientes] + [del_dia]
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame(columns=VENTAS_COLUMNAS)
+    ventas = _normalizar_ventas(pd.concat(partes, ignore_index=True))
+    return ventas[ventas["Fecha"].astype(str).str.startswith(dia)].reset_index(drop=True)
+
+# Función para guardar ventas: reescribe todo el histórico (solo para cargas masivas)
+@instrumentar()
+@_exclusivo
+def guardar_ventas(df):
+    df["Precio Unitario"] = df["Precio Unitario"].round(2)
+    df["Total"] = df["Total"].round(2)
+    if BACKEND == "sqlite":
+        _sqlite().guardar_ventas(df)
+    else:
+        _guardar_ventas_csv(df)
+    invalidar_cache("ventas", "agregados")
+
+def _guardar_ventas_csv(df):
+    df = df[VENTAS_COLUMNAS].reset_index(drop=True)
+    if BACKEND == "parquet":
+        # La carga masiva reemplaza todo, incluidas las colas pendientes
+        for ruta in _colas_movidas():
+            os.remove(ruta)
+        columnar.reemplazar_ventas(datetime.now().strftime("%Y%m%d%H%M%S%f"), df, _tabla_agregados(AgregadosVentas.desde_ventas(df)))
+        with open(VENTAS_FILE, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f, lineterminator="\n").writerow(VENTAS_COLUMNAS)
+        return
+    pendientes = _colas_movidas()
+    _escribir_compactadas(_por_mes(df), {}, {_lote_de(ruta) for ruta in pendientes}, AgregadosVentas.desde_ventas(df))
+    with open(VENTAS_FILE, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f, lineterminator="\n").writerow(VENTAS_COLUMNAS)
+    for ruta in pendientes:
+        os.remove(ruta)
+
+# Registrar ventas (tuplas fecha, ID, producto, cantidad, precio unitario, usuario) en la cola:
+# anexa las líneas en una sola escritura, sin reescribir el histórico
+@instrumentar()
+@_exclusivo
+def registrar_ventas(ventas):
+    filas = [[fecha, id_producto, producto, int(cantidad), round(float(precio_unitario), 2),
+              round(cantidad * float(precio_unitario), 2), usuario]
+             for fecha, id_producto, producto, cantidad, precio_unitario, usuario in ventas]
+    registradas = [dict(zip(VENTAS_COLUMNAS, fila)) for fila in filas]
+    if BACKEND == "parquet":
+        _parquet()  # La cola vive en el directorio de Parquet
+    nuevo = not os.path.exists(VENTAS_FILE) or os.path.getsize(VENTAS_FILE) == 0
+    firma_anterior = _firma(_rutas("agregados"))
+    with open(VENTAS_FILE, "a", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f, lineterminator="\n")
+        if nuevo:
+            escritor.writerow(VENTAS_COLUMNAS)
+        inicio = f.tell()
+        escritor.writerows(filas)
+        anotar(filas=len(filas), bytes_escritos=f.tell() - inicio)
+    invalidar_cache("ventas")
+    _sumar_a_agregados(firma_anterior, registradas)
+    if os.path.getsize(VENTAS_FILE) > UMBRAL_COMPACTACION:
+        compactar_ventas()
+    return registradas
+
+# Sumar las ventas recién anexadas a los agregados en caché, sin volver a leer la cola.
+# Si los archivos cambiaron por otro motivo, los agregados se recargan en la próxima lectura.
+def _sumar_a_agregados(firma_anterior, ventas):
+    with _cache_lock:
+        entrada = _cache.get("agregados")
+        if entrada is not None and entrada[0] == firma_anterior:
+            if len(ventas) == 1:
+                agregados = entrada[1].con_venta(ventas[0])
+            else:
+                agregados = entrada[1].combinar(AgregadosVentas.desde_ventas(pd.DataFrame(ventas, columns=VENTAS_COLUMNAS)))
+            _cache["agregados"] = (_firma(_rutas("agregados")), agregados)
+        else:
+            _cache.pop("agregados", None)
+
+# Compactar: mueve la cola a un archivo temporal y la integra al histórico compactado
+@instrumentar()
+@_exclusivo
+def compactar_ventas():
+    if not os.path.exists(VENTAS_FILE):
+        return
+    lote = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    os.replace(VENTAS_FILE, _archivo_compactando(lote))
+    with open(VENTAS_FILE, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f, lineterminator="\n").writerow(VENTAS_COLUMNAS)
+    if BACKEND == "parquet":
+        # Cada cola se guarda como un archivo nuevo: el histórico existente no se reescribe
+        _borrar_colas_incluidas(_parquet().lotes())  # De una compactación que se cayó al final
+        for ruta in _colas_pendientes(columnar.lotes()):
+            cola = _leer_cola(ruta)
+            if not cola.empty:
+                cola = _normalizar_ventas(cola)
+                columnar.escribir_lote(_lote_de(ruta), cola, _tabla_agregados(AgregadosVentas.desde_ventas(cola)))
+            os.remove(ruta)
+        invalidar_cache("ventas", "agregados")
+        return
+    manifiesto = _leer_manifiesto()
+    _borrar_colas_incluidas(set(manifiesto["lotes"]))
+    pendientes = _colas_pendientes(set(manifiesto["lotes"]))
+    agregados = _agregados_compactados(manifiesto)
+    colas = [c for c in (_leer_cola(ruta) for ruta in pendientes) if not c.empty]
+    meses = {}
+    if colas:
+        nuevas = _normalizar_ventas(pd.concat(colas, ignore_index=True))
+        agregados = agregados.combinar(AgregadosVentas.desde_ventas(nuevas))  # Solo se agregan las ventas nuevas
+        # Solo se reescriben los meses que reciben ventas (normalmente el actual)
+        for mes, del_mes in _por_mes(nuevas).items():
+            anterior = manifiesto["particiones"].get(mes)
+            meses[mes] = del_mes if anterior is None else pd.concat([_leer_particion(anterior), del_mes], ignore_index=True)
+    # Los lotes guardados marcan qué colas ya están incluidas, así una caída aquí no duplica ventas
+    _escribir_compactadas(meses, manifiesto["particiones"], {_lote_de(ruta) for ruta in pendientes}, agregados)
+    for ruta in pendientes:
+        os.remove(ruta)
+    invalidar_cache("ventas", "agregados")
+
+# Registrar cambios en historial: anexa una línea sin leer el archivo existente
+def registrar_cambio(accion, id_producto, usuario):
+    registrar_cambios([(accion, id_producto, usuario)])
+
+# Registrar varios cambios en una sola escritura (p. ej. todos los productos de un reabastecimiento)
+@instrumentar()
+@_exclusivo
+def registrar_cambios(cambios):
+    fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if BACKEND == "sqlite":
+        _sqlite().registrar_cambios([(fecha, accion, id_producto, usuario) for accion, id_producto, usuario in cambios])
+        return
+    if BACKEND == "parquet":
+        _parquet()  # El historial vive en el directorio de Parquet
+    nuevo = not os.path.exists(HISTORIAL_FILE) or os.path.getsize(HISTORIAL_FILE) == 0
+    with open(HISTORIAL_FILE, "a", newline="", encoding="utf-8") as f:
+        escritor = csv.writer(f, lineterminator="\n")
+        if nuevo:
+            escritor.writerow(HISTORIAL_COLUMNAS)
+        inicio = f.tell()
+        escritor.writerows([fecha, accion, id_producto, usuario] for accion, id_producto, usuario in cambios)
+        anotar(filas=len(cambios), bytes_escritos=f.tell() - inicio)
+
+# Índice de líneas del historial: cuántas hay y en qué byte empieza cada registro múltiplo de
+# PASO_INDICE_HISTORIAL. Como al historial solo se anexan líneas, cada vez se recorren solo los
+# bytes nuevos; si el archivo se reemplazó o se achicó se vuelve a construir.
+PASO_INDICE_HISTORIAL = 1024
+_indice_historial = {}
+_indice_historial_lock = threading.Lock()
+
+def _indice_lineas_historial():
+    estado = os.stat(HISTORIAL_FILE)
+    clave = os.path.abspath(HISTORIAL_FILE)
+    with _indice_historial_lock:
+        indice = _indice_historial.get(clave)
+        if indice is None or indice["inodo"] != estado.st_ino or indice["bytes"] > estado.st_size:
+            indice = {"inodo": estado.st_ino, "bytes": 0, "lineas": 0, "posiciones": []}
+        if indice["bytes"] < estado.st_size:
+            with open(HISTORIAL_FILE, "rb") as f:
+                f.seek(indice["bytes"])
+                for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                    # El registro n (desde 0) empieza después del salto de línea n: el del encabezado es el 0
+                    saltos = np.flatnonzero(np.frombuffer(bloque, dtype=np.uint8) == ord("\n"))
+                    numeros = indice["lineas"] + np.arange(len(saltos))
+                    marcados = saltos[numeros % PASO_INDICE_HISTORIAL == 0]
+                    indice["posiciones"].extend((indice["bytes"] + marcados + 1).tolist())
+                    indice["lineas"] += len(saltos)
+                    indice["bytes"] += len(bloque)
+        _indice_historial[clave] = indice
+        return indice["lineas"], indice["posiciones"]
+
+# Contar los registros del historial sin convertirlos en dataframe
+def contar_cambios():
+    if BACKEND == "sqlite":
+        return _sqlite().contar_cambios()
+    if not os.path.exists(HISTORIAL_FILE):
+        return 0
+    lineas, _ = _indice_lineas_historial()
+    return max(lineas - 1, 0)  # Sin contar el encabezado
+
+# Leer una página del historial (pagina empieza en 0) sin cargar el archivo completo: con el
+# índice de líneas se salta directo cerca del primer registro y se leen solo las líneas de la página
+@instrumentar()
+def leer_historial(pagina, tamaño_pagina=100):
+    if BACKEND == "sqlite":
+        return _sqlite().leer_historial(pagina, tamaño_pagina)
+    if not os.path.exists(HISTORIAL_FILE):
+        return pd.DataFrame(columns=HISTORIAL_COLUMNAS)
+    lineas, posiciones = _indice_lineas_historial()
+    inicio = pagina * tamaño_pagina
+    fin = min(inicio + tamaño_pagina, lineas - 1)
+    if inicio >= fin:
+        return pd.DataFrame(columns=HISTORIAL_COLUMNAS)
+    marca = inicio // PASO_INDICE_HISTORIAL
+    with open(HISTORIAL_FILE, "rb") as f:
+        f.seek(posiciones[marca])
+        contenido = b"".join(itertools.islice(f, inicio - marca * PASO_INDICE_HISTORIAL, fin - marca * PASO_INDICE_HISTORIAL))
+    anotar(bytes_leidos=len(contenido))
+    return pd.read_csv(io.BytesIO(contenido), header=None, names=HISTORIAL_COLUMNAS, dtype={"ID Producto": str})
+
+if __name__ == "__main__":
+    if base_datos.esta_vacia():
+        migrar_csv_a_sqlite()
+        print(f"Datos migrados a {base_datos.DB_FILE}")
+    else:
+        print(f"{base_datos.DB_FILE} ya contiene datos; no se migró nada.")
@@ -1,127 +1,85 @@
 import streamlit as st
 import pandas as pd
-import os
-from datetime import datetime, timedelta
-import plotly.express as px
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib import colors
-from reportlab.lib.styles import ParagraphStyle
-from io import BytesIO
-from statsmodels.tsa.arima.model import ARIMA
-import warnings
+import numpy as np
+from datetime import datetime
+from functools import partial
+from almacenamiento import (cargar_inventario, fila_producto, guardar_inventario, reabastecer, actualizar_producto, eliminar_producto,
+                            vender_producto, cargar_agregados, ventas_del_dia, registrar_cambio,
+                            contar_cambios, leer_historial)
+from importacion import importar_csv, leer_preparado, descartar_preparado, FILAS_MUESTRA
+from busqueda import obtener_indice, actualizar_indice
+from reporte import obtener_pdf, pdf_en_cache, version_inventario, estado_generacion
+from pronostico import (cargar_pronosticos, cargar_detalle_pronosticos, demanda_pronosticada, marca_de_ventas,
+                        recalcular_en_segundo_plano, estado_recalculo)
+from motor import guardar_demanda_estimada
+from instrumentacion import ACTIVA as INSTRUMENTACION_ACTIVA, iniciar, terminar, tramos, resumen, exportar_json
 
 # Configuración inicial
 st.set_page_config(page_title="Inventario Ferretería", layout="wide")
 st.title("Sistema de Inventario - Ferretería")
 
-# Archivos
-CSV_FILE = "inventario_ferreteria.csv"
-HISTORIAL_FILE = "historial_cambios.csv"
-VENTAS_FILE = "ventas.csv"
 USERS = {"admin": "ferreteria123"}  # Usuario y contraseña simples
+ADMINISTRADORES = {"admin"}  # Usuarios que ven el panel de tiempos
+MAX_RESULTADOS_BUSQUEDA = 500
+FILAS_POR_PAGINA = [50, 100, 250, 500]
+COLUMNAS_REPORTE = ["ID", "Producto", "Categoría", "Cantidad", "Precio"]  # Columnas que lee la página de reporte
 
-# Datos de demostración para inventario
-DEMO_DATA = pd.DataFrame({
-    "ID": ["001", "002", "003", "004", "005"],
-    "Producto": ["Taladro Eléctrico", "Pintura Blanca", "Tornillos 1/4", "Martillo", "Cable 10m"],
-    "Categoría": ["Herramientas", "Pinturas", "Materiales", "Herramientas", "Electricidad"],
-    "Cantidad": [10, 5, 100, 8, 15],
-    "Precio": [150.50, 25.75, 0.10, 12.00, 8.90],
-    "Proveedor": ["Bosch", "Sherwin", "Genérico", "Truper", "Voltex"],
-    "Última Actualización": ["2025-03-02 10:00:00", "2025-03-01 15:30:00", "2025-02-28 09:15:00", 
-                            "2025-03-01 12:00:00", "2025-03-02 14:20:00"],
-    "Demanda Estimada": [0.0, 0.0, 0.0, 0.0, 0.0]
-})
-
-# Datos de demostración para ventas históricas (30 días)
-fecha_inicio = datetime(2025, 2, 1)
-DEMO_VENTAS = []
-for i in range(30):
-    fecha = fecha_inicio + timedelta(days=i)
-    DEMO_VENTAS.extend([
-        {"Fecha": fecha.strftime("%Y-%m-%d 09:00:00"), "ID": "001", "Producto": "Taladro Eléctrico", "Cantidad Vendida": 2, "Precio Unitario": 150.50, "Total": 301.00, "Usuario": "admin"},
-        {"Fecha": fecha.strftime("%Y-%m-%d 10:00:00"), "ID": "002", "Producto": "Pintura Blanca", "Cantidad Vendida": 1, "Precio Unitario": 25.75, "Total": 25.75, "Usuario": "admin"},
-        {"Fecha": fecha.strftime("%Y-%m-%d 11:00:00"), "ID": "003", "Producto": "Tornillos 1/4", "Cantidad Vendida": 10, "Precio Unitario": 0.10, "Total": 1.00, "Usuario": "admin"},
-        {"Fecha": fecha.strftime("%Y-%m-%d 12:00:00"), "ID": "004", "Producto": "Martillo", "Cantidad Vendida": 1, "Precio Unitario": 12.00, "Total": 12.00, "Usuario": "admin"},
-        {"Fecha": fecha.strftime("%Y-%m-%d 13:00:00"), "ID": "005", "Producto": "Cable 10m", "Cantidad Vendida": 3, "Precio Unitario": 8.90, "Total": 26.70, "Usuario": "admin"}
-    ])
-DEMO_VENTAS = pd.DataFrame(DEMO_VENTAS)
-
-# Función para cargar inventario
-def cargar_inventario():
-    if not os.path.exists(CSV_FILE):
-        DEMO_DATA.to_csv(CSV_FILE, index=False)
-        return DEMO_DATA.copy()
-    df = pd.read_csv(CSV_FILE)
-    df["Precio"] = df["Precio"].round(2)
-    if "Demanda Estimada" not in df.columns:
-        df["Demanda Estimada"] = 0.0
-    return df
-
-# Función para guardar inventario
-def guardar_inventario(df):
-    df["Precio"] = df["Precio"].round(2)
-    df["Demanda Estimada"] = df["Demanda Estimada"].round(2)
-    df.to_csv(CSV_FILE, index=False)
-
-# Función para cargar ventas
-def cargar_ventas():
-    if not os.path.exists(VENTAS_FILE):
-        DEMO_VENTAS.to_csv(VENTAS_FILE, index=False)
-        return DEMO_VENTAS.copy()
-    df = pd.read_csv(VENTAS_FILE)
-    df["Precio Unitario"] = df["Precio Unitario"].round(2)
-    df["Total"] = df["Total"].round(2)
-    return df
-
-# Función para guardar ventas
-def guardar_ventas(df):
-    df["Precio Unitario"] = df["Precio Unitario"].round(2)
-    df["Total"] = df["Total"].round(2)
-    df.to_csv(VENTAS_FILE, index=False)
-
-# Registrar cambios en historial
-def registrar_cambio(accion, id_producto, usuario):
-    historial = pd.DataFrame({
-        "Fecha": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-        "Acción": [accion],
-        "ID Producto": [id_producto],
-        "Usuario": [usuario]
-    })
-    if os.path.exists(HISTORIAL_FILE):
-        historial_existente = pd.read_csv(HISTORIAL_FILE)
-        historial = pd.concat([historial_existente, historial], ignore_index=True)
-    historial.to_csv(HISTORIAL_FILE, index=False)
-
-# Función para calcular demanda estimada con ARIMA
-def calcular_demanda_estimada(ventas, inventario, periodos_prediccion=30):
-    ventas["Fecha"] = pd.to_datetime(ventas["Fecha"])
-    inventario["Demanda Estimada"] = 0.0
-    
-    for id_prod in inventario["ID"].unique():
-        ventas_prod = ventas[ventas["ID"] == id_prod].copy()
-        if not ventas_prod.empty and len(ventas_prod) >= 10:  # Mínimo 10 puntos para ARIMA
-            ventas_diarias = ventas_prod.groupby(ventas_prod["Fecha"].dt.date)["Cantidad Vendida"].sum().reset_index()
-            ventas_diarias.set_index("Fecha", inplace=True)
-            serie_temporal = ventas_diarias["Cantidad Vendida"].resample("D").sum().fillna(0)
-            
-            try:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    modelo = ARIMA(serie_temporal, order=(1, 1, 1))
-                    resultado = modelo.fit()
-                    prediccion = resultado.forecast(steps=periodos_prediccion)
-                    demanda_estimada = prediccion.mean()
-                    inventario.loc[inventario["ID"] == id_prod, "Demanda Estimada"] = demanda_estimada
-            except ValueError as e:
-                st.warning(f"No se pudo ajustar ARIMA para ID {id_prod}: {str(e)}. Datos insuficientes o inadecuados.")
-            except Exception as e:
-                st.warning(f"Error inesperado para ID {id_prod}: {str(e)}")
-        else:
-            st.info(f"No hay suficientes datos para ID {id_prod} (mínimo 10 ventas).")
-    
-    return inventario
+# Posiciones de fila por cada Categoría y Proveedor, calculadas una vez por versión del inventario
+@st.cache_resource(max_entries=2)
+def indices_filtros(version, _inventario):
+    return {columna: {valor: posiciones for valor, posiciones in _inventario.groupby(columna, sort=True, observed=True).indices.items()}
+            for columna in ["Categoría", "Proveedor"]}
+
+# Resaltar stock agotado (rojo) y bajo (amarillo) con comparaciones vectorizadas
+def estilos_stock(df):
+    cantidad = df["Cantidad"].to_numpy()
+    color = np.where(cantidad == 0, "background-color: red", np.where(cantidad < 5, "background-color: yellow", ""))
+    return pd.DataFrame(np.repeat(color[:, None], df.shape[1], axis=1), index=df.index, columns=df.columns)
+
+# CSV con las filas filtradas del inventario; el botón de descarga lo genera solo al pulsarlo
+def csv_filtrado(inventario, posiciones):
+    return inventario.take(posiciones).to_csv(index=False)
+
+# Importar el CSV subido una sola vez: los reruns (p. ej. al pulsar "Confirmar") reutilizan el resultado preparado
+def importacion_preparada(uploaded_file, clave):
+    archivo_id = (uploaded_file.name, uploaded_file.size, getattr(uploaded_file, "file_id", None))
+    anterior = st.session_state.get(clave)
+    if anterior is None or anterior["archivo_id"] != archivo_id:
+        if anterior is not None:
+            descartar_preparado(anterior["resultado"]["preparado"])
+        st.session_state[clave] = {"archivo_id": archivo_id, "resultado": importar_csv(uploaded_file)}
+    return st.session_state[clave]["resultado"]
+
+# Mostrar errores o vista previa de una importación; devuelve True si se puede confirmar
+def mostrar_importacion(resultado):
+    if resultado["error"]:
+        st.error(resultado["error"])
+        return False
+    if resultado["total_errores"]:
+        st.error(f"El CSV contiene {resultado['total_errores']} error(es). Corrige el archivo y vuelve a intentarlo.")
+        st.dataframe(resultado["errores"].head(FILAS_MUESTRA))
+        st.download_button(label="Descargar reporte de errores", data=resultado["errores"].to_csv(index=False),
+                           file_name="errores_importacion.csv", mime="text/csv")
+        return False
+    st.write(f"Vista previa del CSV (primeras {len(resultado['muestra'])} de {resultado['filas']} filas):")
+    st.dataframe(resultado["muestra"].style.format({"Precio": "{:.2f}", "Demanda Estimada": "{:.2f}"}))
+    return True
+
+# Panel de tiempos: tramos de esta ejecución de la página (con su anidación) y resumen acumulado
+def mostrar_panel_tiempos(ejecucion):
+    with st.expander(f"Panel de tiempos ({ejecucion['ms']:.0f} ms)"):
+        actual = pd.DataFrame(tramos(ejecucion["id"])).sort_values("id")
+        profundidad = {}
+        for id_tramo, padre in zip(actual["id"], actual["padre"]):
+            profundidad[id_tramo] = profundidad.get(padre, -1) + 1
+        actual["nombre"] = ["· " * profundidad[i] + nombre for i, nombre in zip(actual["id"], actual["nombre"])]
+        columnas = [col for col in ["nombre", "ms", "filas", "bytes_leidos", "bytes_escritos", "cache", "error"] if col in actual.columns]
+        st.dataframe(actual[columnas], hide_index=True)
+        st.write("Acumulado desde que se inició el servidor:")
+        st.dataframe(resumen().style.format({"total_ms": "{:.1f}", "p50_ms": "{:.2f}", "p95_ms": "{:.2f}", "max_ms": "{:.2f}"}),
+                     hide_index=True)
+        st.download_button(label="Exportar registro (JSON)", data=exportar_json(),
+                           file_name=f"tiempos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl", mime="application/json")
 
 # Autenticación
 if "authenticated" not in st.session_state:
@@ -139,9 +97,10 @@ if not st.session_state.authenticated:
         else:
             st.error("Usuario o contraseña incorrectos.")
 else:
-    # Cargar inventario y ventas
-    inventario = cargar_inventario()
-    ventas = cargar_ventas()
+    ejecucion = iniciar("página", raiz=True)
+    # Cargar agregados de ventas (por día, producto y usuario); el inventario lo carga cada página
+    # con las columnas que usa (en Parquet solo se leen esas columnas)
+    agregados = cargar_agregados()
 
     # Barra lateral con menú
     menu = st.sidebar.selectbox(
@@ -149,6 +108,7 @@ else:
         ["Ver Inventario", "Registrar Ventas", "Cargar CSV", "Reabastecer Stock", "Buscar Producto", 
          "Editar Producto", "Eliminar Producto", "Reporte", "Historial"]
     )
+    ejecucion["pagina"] = menu
     st.sidebar.write(f"Usuario: {st.session_state.usuario}")
     if st.sidebar.button("Cerrar Sesión"):
         st.session_state.authenticated = False
@@ -158,37 +118,79 @@ else:
     # Opción 1: Ver Inventario
     if menu == "Ver Inventario":
         st.subheader("Inventario Actual")
+        inventario = cargar_inventario()
         if inventario.empty:
             st.warning("El inventario está vacío.")
         else:
-            if st.button("Calcular Demanda Estimada"):
-                inventario = calcular_demanda_estimada(ventas, inventario)
-                guardar_inventario(inventario)
-                st.success("Demanda estimada calculada con éxito!")
+            # Los pronósticos se calculan en segundo plano y se leen de la caché; la página nunca espera al ajuste
+            pronosticos = cargar_pronosticos()
+            recalculo = estado_recalculo()
+            marca = marca_de_ventas(agregados)
+            ventas_nuevas = pronosticos is None or pronosticos["marca_ventas"] != marca
+            if st.button("Calcular Demanda Estimada") or (ventas_nuevas and not recalculo["en_curso"] and recalculo["error"] is None):
+                recalcular_en_segundo_plano(partial(guardar_demanda_estimada, agregados, inventario.copy()))
+                recalculo = estado_recalculo()
+
+            if pronosticos is not None:
+                inventario["Demanda Estimada"] = inventario["ID"].map(demanda_pronosticada()).fillna(inventario["Demanda Estimada"])
+                nuevas = marca["ventas"] - pronosticos["marca_ventas"]["ventas"]
+                estado = f"{nuevas} venta(s) nueva(s) desde entonces" if ventas_nuevas else "al día"
+                st.caption(f"Demanda estimada calculada el {pronosticos['calculado']} ({estado}).")
+                # El cuerpo del expander se ejecuta aunque esté cerrado: por defecto solo el resumen
+                with st.expander("Detalle por producto"):
+                    estados = pronosticos["estados"]
+                    st.write(f"Ajustados: {estados.get('ajustado', 0)}, reutilizados: {estados.get('reutilizado', 0)}, "
+                             f"omitidos: {estados.get('omitido', 0) + estados.get('error', 0)} ({pronosticos['segundos']:.1f} s de ajuste)")
+                    st.write("Modelos: " + ", ".join(f"{modelo}: {n}" for modelo, n in pronosticos["modelos"].items()))
+                    if st.checkbox("Ver detalle por producto"):
+                        detalle = cargar_detalle_pronosticos()
+                        total_paginas = max((len(detalle) - 1) // FILAS_POR_PAGINA[1] + 1, 1)
+                        pagina_detalle = st.number_input(f"Página del detalle (de {total_paginas})", min_value=1,
+                                                         max_value=total_paginas, value=1, step=1)
+                        inicio = (pagina_detalle - 1) * FILAS_POR_PAGINA[1]
+                        st.dataframe(detalle.iloc[inicio:inicio + FILAS_POR_PAGINA[1]].round({"Demanda Estimada": 2, "Segundos": 3}),
+                                     hide_index=True)
+            if recalculo["en_curso"]:
+                st.info(f"Recalculando la demanda estimada en segundo plano (iniciado {recalculo['iniciado']}). Actualiza la página para ver el resultado.")
+            elif recalculo["error"]:
+                st.error(f"Error al calcular la demanda estimada: {recalculo['error']}")
 
+            # Filtrar por posiciones precalculadas, ordenar y paginar sin copiar el inventario completo;
+            # solo la página visible se estiliza y se envía al navegador
+            indices = indices_filtros(inventario.attrs.get("version"), inventario)
             col1, col2 = st.columns(2)
             with col1:
-                categoria_filtro = st.selectbox("Filtrar por Categoría", ["Todas"] + inventario["Categoría"].unique().tolist())
+                categoria_filtro = st.selectbox("Filtrar por Categoría", ["Todas"] + list(indices["Categoría"]))
             with col2:
-                proveedor_filtro = st.selectbox("Filtrar por Proveedor", ["Todos"] + inventario["Proveedor"].unique().tolist())
-            
-            inventario_filtrado = inventario.copy()
+                proveedor_filtro = st.selectbox("Filtrar por Proveedor", ["Todos"] + list(indices["Proveedor"]))
+
+            posiciones = np.arange(len(inventario))
             if categoria_filtro != "Todas":
-                inventario_filtrado = inventario_filtrado[inventario_filtrado["Categoría"] == categoria_filtro]
+                posiciones = indices["Categoría"][categoria_filtro]
             if proveedor_filtro != "Todos":
-                inventario_filtrado = inventario_filtrado[inventario_filtrado["Proveedor"] == proveedor_filtro]
-            
-            def color_stock(row):
-                if row["Cantidad"] == 0:
-                    return ['background-color: red'] * len(row)
-                elif row["Cantidad"] < 5:
-                    return ['background-color: yellow'] * len(row)
-                return [''] * len(row)
-            
-            st.dataframe(inventario_filtrado.style.apply(color_stock, axis=1).format({"Precio": "{:.2f}", "Demanda Estimada": "{:.2f}"}))
+                posiciones = np.intersect1d(posiciones, indices["Proveedor"][proveedor_filtro], assume_unique=True)
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                orden_columna = st.selectbox("Ordenar por", ["(sin orden)"] + inventario.columns.tolist())
+            with col2:
+                descendente = st.checkbox("Descendente")
+            with col3:
+                filas_pagina = st.selectbox("Filas por página", FILAS_POR_PAGINA, index=1)
+            total_paginas = max((len(posiciones) - 1) // filas_pagina + 1, 1)
+            with col4:
+                pagina = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1, step=1)
+
+            if orden_columna != "(sin orden)":
+                columna = inventario[orden_columna].take(posiciones).reset_index(drop=True)
+                posiciones = posiciones[columna.sort_values(ascending=not descendente, kind="stable").index.to_numpy()]
+            pagina_actual = inventario.take(posiciones[(pagina - 1) * filas_pagina:pagina * filas_pagina])
+
+            st.dataframe(pagina_actual.style.apply(estilos_stock, axis=None).format({"Precio": "{:.2f}", "Demanda Estimada": "{:.2f}"}))
+            st.caption(f"{len(posiciones)} producto(s) encontrados.")
             st.download_button(
                 label="Descargar Inventario como CSV",
-                data=inventario_filtrado.to_csv(index=False),
+                data=partial(csv_filtrado, inventario, posiciones),
                 file_name=f"inventario_{datetime.now().strftime('%Y%m%d')}.csv",
                 mime="text/csv"
             )
@@ -196,58 +198,36 @@ else:
     # Opción 2: Registrar Ventas
     elif menu == "Registrar Ventas":
         st.subheader("Registrar Ventas del Día")
-        inventario["ID"] = inventario["ID"].astype(str)
-        productos_disponibles = [f"{row['Producto']} (ID: {row['ID']}, Stock: {row['Cantidad']})" 
-                                for _, row in inventario.iterrows() if row['Cantidad'] > 0]
-        
+        # Etiquetas armadas por columnas; el selectbox devuelve directamente el ID elegido
+        inventario = cargar_inventario(["ID", "Producto", "Cantidad"])
+        disponibles = inventario[inventario["Cantidad"] > 0]
+        etiquetas = dict(zip(disponibles["ID"], disponibles["Producto"].astype(str) + " (ID: " + disponibles["ID"] +
+                                                ", Stock: " + disponibles["Cantidad"].astype(str) + ")"))
+
         with st.form(key="ventas_form"):
-            if productos_disponibles:
-                producto_seleccionado = st.selectbox("Selecciona un Producto", productos_disponibles)
+            if etiquetas:
+                id_venta = st.selectbox("Selecciona un Producto", list(etiquetas), format_func=etiquetas.get)
                 cantidad_vendida = st.number_input("Cantidad Vendida", min_value=1, step=1)
                 submit_venta = st.form_submit_button(label="Registrar Venta")
 
                 if submit_venta:
                     try:
-                        id_venta = producto_seleccionado.split("ID: ")[1].split(",")[0].strip()
-                        if id_venta in inventario["ID"].values:
-                            producto = inventario[inventario["ID"] == id_venta].iloc[0]
-                            if producto["Cantidad"] >= cantidad_vendida:
-                                inventario.loc[inventario["ID"] == id_venta, "Cantidad"] -= cantidad_vendida
-                                inventario.loc[inventario["ID"] == id_venta, "Última Actualización"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                guardar_inventario(inventario)
-
-                                total_venta = cantidad_vendida * producto["Precio"]
-                                nueva_venta = pd.DataFrame({
-                                    "Fecha": [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-                                    "ID": [id_venta],
-                                    "Producto": [producto["Producto"]],
-                                    "Cantidad Vendida": [cantidad_vendida],
-                                    "Precio Unitario": [producto["Precio"]],
-                                    "Total": [total_venta],
-                                    "Usuario": [st.session_state.usuario]
-                                })
-                                ventas = pd.concat([ventas, nueva_venta], ignore_index=True)
-                                guardar_ventas(ventas)
-
-                                registrar_cambio("Venta", id_venta, st.session_state.usuario)
-                                st.success(f"Venta registrada: {cantidad_vendida} de '{producto['Producto']}' por ${total_venta:.2f}")
-                                inventario = cargar_inventario()  # Recargar inventario
-                            else:
-                                st.error(f"No hay suficiente stock. Disponible: {producto['Cantidad']}")
-                        else:
-                            st.error(f"El ID '{id_venta}' no se encontró en el inventario.")
-                    except IndexError:
-                        st.error("Error al procesar el producto seleccionado. Verifica la selección.")
+                        # El descuento de stock se valida contra el inventario guardado, no contra esta copia
+                        nueva_venta = vender_producto(id_venta, cantidad_vendida, st.session_state.usuario)
+                        agregados = cargar_agregados()
+                        st.success(f"Venta registrada: {cantidad_vendida} de '{nueva_venta['Producto']}' por ${nueva_venta['Total']:.2f}")
+                    except ValueError as e:
+                        st.error(str(e))
             else:
                 st.warning("No hay productos con stock disponible para vender. Reabastece el inventario primero.")
 
         st.subheader("Ventas Registradas Hoy")
         hoy = datetime.now().strftime("%Y-%m-%d")
-        ventas_hoy = ventas[ventas["Fecha"].str.startswith(hoy)]
-        if not ventas_hoy.empty:
+        resumen_hoy = agregados.resumen_dia(hoy)
+        if resumen_hoy["Ventas"] > 0:
+            ventas_hoy = ventas_del_dia(hoy)
             st.dataframe(ventas_hoy.style.format({"Precio Unitario": "{:.2f}", "Total": "{:.2f}"}))
-            total_dia = ventas_hoy["Total"].sum()
-            st.write(f"**Total de Ventas del Día:** ${total_dia:.2f}")
+            st.write(f"**Total de Ventas del Día:** ${resumen_hoy['Total']:.2f}")
         else:
             st.info("No hay ventas registradas para hoy.")
 
@@ -274,40 +254,14 @@ else:
         uploaded_file = st.file_uploader("Selecciona un archivo CSV", type=["csv"])
         if uploaded_file is not None:
             try:
-                nuevo_inventario = pd.read_csv(uploaded_file)
-                columnas_esperadas = ["ID", "Producto", "Categoría", "Cantidad", "Precio", "Proveedor", "Última Actualización"]
-                
-                if not all(col in nuevo_inventario.columns for col in columnas_esperadas):
-                    st.error(f"El CSV debe contener las columnas obligatorias: {', '.join(columnas_esperadas)}.")
-                else:
-                    try:
-                        nuevo_inventario["Cantidad"] = nuevo_inventario["Cantidad"].astype(int)
-                        nuevo_inventario["Precio"] = nuevo_inventario["Precio"].astype(float)
-                        pd.to_datetime(nuevo_inventario["Última Actualización"], format="%Y-%m-%d %H:%M:%S")
-                    except ValueError as e:
-                        st.error(f"Error en los datos: {str(e)}. Verifica que 'Cantidad' sea entero, 'Precio' sea número y 'Última Actualización' esté en formato `YYYY-MM-DD HH:MM:SS`.")
-                    else:
-                        if nuevo_inventario["ID"].duplicated().any():
-                            st.error("El CSV contiene IDs duplicados. Corrige el archivo y vuelve a intentarlo.")
-                        elif nuevo_inventario["Cantidad"].lt(0).any():
-                            st.error("La columna 'Cantidad' no puede contener valores negativos.")
-                        elif nuevo_inventario["Precio"].lt(0).any():
-                            st.error("La columna 'Precio' no puede contener valores negativos.")
-                        else:
-                            nuevo_inventario["Precio"] = nuevo_inventario["Precio"].round(2)
-                            if "Demanda Estimada" not in nuevo_inventario.columns:
-                                nuevo_inventario["Demanda Estimada"] = 0.0
-                            else:
-                                nuevo_inventario["Demanda Estimada"] = nuevo_inventario["Demanda Estimada"].fillna(0.0).round(2)
-                            
-                            st.write("Vista previa del CSV:")
-                            st.dataframe(nuevo_inventario.style.format({"Precio": "{:.2f}", "Demanda Estimada": "{:.2f}"}))
-                            if st.button("Confirmar Carga"):
-                                inventario = nuevo_inventario.copy()
-                                guardar_inventario(inventario)
-                                registrar_cambio("Cargar CSV", "Todos", st.session_state.usuario)
-                                st.success("Inventario actualizado desde el CSV con éxito!")
-                                inventario = cargar_inventario()  # Recargar inventario
+                importacion = importacion_preparada(uploaded_file, "importacion_cargar")
+                if mostrar_importacion(importacion):
+                    if st.button("Confirmar Carga"):
+                        guardar_inventario(leer_preparado(importacion["preparado"]))
+                        registrar_cambio("Cargar CSV", "Todos", st.session_state.usuario)
+                        descartar_preparado(importacion["preparado"])
+                        st.session_state.pop("importacion_cargar")
+                        st.success("Inventario actualizado desde el CSV con éxito!")
             except pd.errors.EmptyDataError:
                 st.error("El archivo CSV está vacío.")
             except pd.errors.ParserError:
@@ -318,52 +272,44 @@ else:
     # Opción 4: Reabastecer Stock
     elif menu == "Reabastecer Stock":
         st.subheader("Reabastecer Stock desde CSV")
-        uploaded_file = st.file_uploader("Selecciona un archivo CSV con nuevos productos", type=["csv"])
+        uploaded_file = st.file_uploader("Selecciona un archivo CSV con la entrega (productos existentes o nuevos)", type=["csv"])
         if uploaded_file is not None:
             try:
-                nuevos_productos = pd.read_csv(uploaded_file)
-                columnas_esperadas = ["ID", "Producto", "Categoría", "Cantidad", "Precio", "Proveedor", "Última Actualización"]
-                if not all(col in nuevos_productos.columns for col in columnas_esperadas):
-                    st.error(f"El CSV debe contener las columnas: {', '.join(columnas_esperadas)}")
-                else:
-                    if nuevos_productos["ID"].duplicated().any():
-                        st.error("El CSV contiene IDs duplicados entre sí.")
-                    elif nuevos_productos["ID"].isin(inventario["ID"]).any():
-                        st.error("Algunos IDs en el CSV ya existen en el inventario.")
-                    elif nuevos_productos["Cantidad"].lt(0).any() or nuevos_productos["Precio"].lt(0).any():
-                        st.error("Cantidad y Precio no pueden ser negativos.")
-                    else:
-                        nuevos_productos["Precio"] = nuevos_productos["Precio"].round(2)
-                        if "Demanda Estimada" not in nuevos_productos.columns:
-                            nuevos_productos["Demanda Estimada"] = 0.0
-                        st.write("Vista previa de los nuevos productos:")
-                        st.dataframe(nuevos_productos.style.format({"Precio": "{:.2f}", "Demanda Estimada": "{:.2f}"}))
-                        if st.button("Confirmar Agregado"):
-                            inventario = pd.concat([inventario, nuevos_productos], ignore_index=True)
-                            guardar_inventario(inventario)
-                            for id_prod in nuevos_productos["ID"]:
-                                registrar_cambio("Agregar", id_prod, st.session_state.usuario)
-                            st.success(f"{len(nuevos_productos)} producto(s) agregado(s) con éxito!")
-                            inventario = cargar_inventario()  # Recargar inventario
+                importacion = importacion_preparada(uploaded_file, "importacion_reabastecer")
+                if mostrar_importacion(importacion):
+                    entrega = leer_preparado(importacion["preparado"])
+                    existentes = int(entrega["ID"].isin(cargar_inventario(["ID"])["ID"]).sum())
+                    st.info(f"{existentes} producto(s) existente(s) sumarán la cantidad recibida; "
+                            f"{len(entrega) - existentes} producto(s) nuevo(s) se agregarán.")
+                    actualizar_precios = st.checkbox("Actualizar precios de productos existentes")
+                    if st.button("Confirmar Reabastecimiento"):
+                        inventario_anterior = cargar_inventario()  # Completo: el índice de búsqueda se actualiza contra él
+                        ids_existentes, ids_nuevos = reabastecer(entrega, st.session_state.usuario, actualizar_precios)
+                        descartar_preparado(importacion["preparado"])
+                        st.session_state.pop("importacion_reabastecer")
+                        st.success(f"Reabastecimiento completado: {len(ids_existentes)} producto(s) actualizado(s) "
+                                   f"y {len(ids_nuevos)} agregado(s).")
+                        actualizar_indice(inventario_anterior, cargar_inventario(), ids_nuevos)
             except pd.errors.EmptyDataError:
                 st.error("El archivo CSV está vacío.")
             except pd.errors.ParserError:
                 st.error("Error al analizar el CSV. Asegúrate de que esté bien formateado.")
             except Exception as e:
                 st.error(f"Error inesperado al procesar el archivo: {str(e)}")
-        st.info("Asegúrate de que el CSV tenga el formato correcto y IDs únicos.")
+        st.info("Los IDs que ya existen suman su cantidad al stock actual; los demás se agregan como productos nuevos.")
 
     # Opción 5: Buscar Producto
     elif menu == "Buscar Producto":
         st.subheader("Buscar Producto")
         busqueda = st.text_input("Ingrese ID, Nombre o Proveedor")
         if busqueda:
-            resultado = inventario[
-                inventario["ID"].str.contains(busqueda, case=False, na=False) |
-                inventario["Producto"].str.contains(busqueda, case=False, na=False) |
-                inventario["Proveedor"].str.contains(busqueda, case=False, na=False)
-            ]
-            if not resultado.empty:
+            inventario = cargar_inventario()
+            ids_encontrados = obtener_indice(inventario).buscar(busqueda, limite=MAX_RESULTADOS_BUSQUEDA + 1)
+            if ids_encontrados:
+                if len(ids_encontrados) > MAX_RESULTADOS_BUSQUEDA:
+                    ids_encontrados = ids_encontrados[:MAX_RESULTADOS_BUSQUEDA]
+                    st.caption(f"Mostrando los {MAX_RESULTADOS_BUSQUEDA} resultados más relevantes.")
+                resultado = inventario.set_index("ID").loc[ids_encontrados].reset_index()
                 st.dataframe(resultado.style.format({"Precio": "{:.2f}", "Demanda Estimada": "{:.2f}"}))
             else:
                 st.warning("No se encontraron productos con ese criterio.")
@@ -372,8 +318,9 @@ else:
     elif menu == "Editar Producto":
         st.subheader("Editar Producto")
         id_editar = str(st.text_input("Ingrese el ID del producto a editar"))
-        if id_editar and id_editar in inventario["ID"].values:
-            producto = inventario[inventario["ID"] == id_editar].iloc[0]
+        inventario = cargar_inventario()
+        producto = fila_producto(inventario, id_editar) if id_editar else None
+        if producto is not None:
             with st.form(key="editar_form"):
                 nombre = st.text_input("Nombre del Producto", value=producto["Producto"])
                 categoria = st.selectbox("Categoría", ["Herramientas", "Materiales", "Pinturas", "Electricidad", "Otros"], 
@@ -384,12 +331,12 @@ else:
                 submit_edit = st.form_submit_button(label="Guardar Cambios")
 
                 if submit_edit:
-                    inventario.loc[inventario["ID"] == id_editar, ["Producto", "Categoría", "Cantidad", "Precio", "Proveedor", "Última Actualización"]] = \
-                        [nombre, categoria, cantidad, round(precio, 2), proveedor, datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-                    guardar_inventario(inventario)
+                    actualizar_producto(id_editar, {"Producto": nombre, "Categoría": categoria, "Cantidad": cantidad, "Precio": round(precio, 2),
+                                                    "Proveedor": proveedor, "Última Actualización": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
                     registrar_cambio("Editar", id_editar, st.session_state.usuario)
                     st.success(f"Producto con ID '{id_editar}' actualizado con éxito!")
-                    inventario = cargar_inventario()  # Recargar inventario
+                    inventario_anterior, inventario = inventario, cargar_inventario()  # Recargar inventario
+                    actualizar_indice(inventario_anterior, inventario, [id_editar])
         elif id_editar:
             st.error("ID no encontrado en el inventario.")
 
@@ -397,22 +344,25 @@ else:
     elif menu == "Eliminar Producto":
         st.subheader("Eliminar Producto")
         id_eliminar = str(st.text_input("Ingrese el ID del producto a eliminar"))
-        if id_eliminar and id_eliminar in inventario["ID"].values:
-            producto = inventario[inventario["ID"] == id_eliminar].iloc[0]
+        inventario = cargar_inventario()
+        producto = fila_producto(inventario, id_eliminar) if id_eliminar else None
+        if producto is not None:
             st.write(f"Producto a eliminar: {producto['Producto']} (Cantidad: {producto['Cantidad']})")
             confirmar = st.button("Confirmar Eliminación")
             if confirmar:
-                inventario = inventario[inventario["ID"] != id_eliminar]
-                guardar_inventario(inventario)
+                eliminar_producto(id_eliminar)
                 registrar_cambio("Eliminar", id_eliminar, st.session_state.usuario)
                 st.success(f"Producto con ID '{id_eliminar}' eliminado con éxito!")
-                inventario = cargar_inventario()  # Recargar inventario
+                inventario_anterior, inventario = inventario, cargar_inventario()  # Recargar inventario
+                actualizar_indice(inventario_anterior, inventario, [id_eliminar])
         elif id_eliminar:
             st.error("ID no encontrado en el inventario.")
 
     # Opción 8: Reporte
     elif menu == "Reporte":
         st.subheader("Reporte del Inventario")
+        # Solo las columnas del resumen y del gráfico; el inventario completo se lee al generar el PDF
+        inventario = cargar_inventario(COLUMNAS_REPORTE)
         if inventario.empty:
             st.warning("No hay datos para generar un reporte.")
         else:
@@ -421,52 +371,55 @@ else:
             st.write(f"**Valor Total del Inventario:** ${total_valor:.2f}")
             st.write(f"**Productos con Bajo Stock (menos de 5 unidades):** {len(bajo_stock)}")
             if not bajo_stock.empty:
-                st.dataframe(bajo_stock.style.format({"Precio": "{:.2f}", "Demanda Estimada": "{:.2f}"}))
+                st.dataframe(bajo_stock.style.format({"Precio": "{:.2f}"}))
             
-            fig = px.bar(inventario.groupby("Categoría")["Cantidad"].sum().reset_index(), 
+            import plotly.express as px  # Solo se importa al abrir el reporte
+            por_categoria = inventario.groupby("Categoría", observed=True)["Cantidad"].sum()
+            fig = px.bar(por_categoria.reset_index(), 
                         x="Categoría", y="Cantidad", title="Cantidad por Categoría")
             st.plotly_chart(fig)
 
-            buffer = BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
-            elements = []
-            title_style = ParagraphStyle(
-                name='Title',
-                fontSize=14,
-                leading=16,
-                alignment=1,
-                spaceAfter=12
-            )
-            elements.append(Paragraph("Reporte de Inventario", title_style))
-            data = [inventario.columns.tolist()] + inventario.values.tolist()
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(table)
-            doc.build(elements)
-            st.download_button(
-                label="Descargar Reporte como PDF",
-                data=buffer.getvalue(),
-                file_name=f"reporte_{datetime.now().strftime('%Y%m%d')}.pdf",
-                mime="application/pdf"
-            )
+            # El PDF se genera solo al pedirlo y queda en caché hasta que cambie el inventario
+            version = version_inventario(inventario)
+            pdf = pdf_en_cache(version)
+            if pdf is None:
+                generacion = estado_generacion()
+                if generacion["en_curso"] and generacion["version"] == version:
+                    st.info("Generando el reporte PDF en segundo plano...")
+                    st.button("Actualizar")
+                elif st.button("Generar Reporte PDF"):
+                    with st.spinner("Generando reporte PDF..."):
+                        pdf = obtener_pdf(cargar_inventario(), version)
+                    if pdf is None:
+                        st.info("El inventario es grande: el reporte PDF se está generando en segundo plano.")
+                        st.button("Actualizar")
+                elif generacion["error"] is not None and generacion["version"] == version:
+                    st.error(f"No se pudo generar el reporte PDF: {generacion['error']}")
+            if pdf is not None:
+                st.download_button(
+                    label="Descargar Reporte como PDF",
+                    data=pdf,
+                    file_name=f"reporte_{datetime.now().strftime('%Y%m%d')}.pdf",
+                    mime="application/pdf"
+                )
 
     # Opción 9: Historial
     elif menu == "Historial":
         st.subheader("Historial de Cambios")
-        if os.path.exists(HISTORIAL_FILE):
-            historial = pd.read_csv(HISTORIAL_FILE)
-            st.dataframe(historial)
+        total_cambios = contar_cambios()
+        if total_cambios > 0:
+            tamaño_pagina = st.selectbox("Registros por página", [50, 100, 500], index=1)
+            total_paginas = (total_cambios - 1) // tamaño_pagina + 1
+            pagina = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=total_paginas, step=1)
+            st.dataframe(leer_historial(pagina - 1, tamaño_pagina))
+            st.write(f"**Total de registros:** {total_cambios}")
         else:
             st.info("No hay historial de cambios registrado aún.")
 
     # Nota al final
     st.markdown("---")
     st.write(f"Última actualización: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    terminar(ejecucion)
+    # Con FERRETERIA_INSTRUMENTACION=0 no se registran tramos y no hay nada que mostrar
+    if INSTRUMENTACION_ACTIVA and st.session_state.usuario in ADMINISTRADORES:
+        mostrar_panel_tiempos(ejecucion)
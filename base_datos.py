@@ -0,0 +1,228 @@
+import sqlite3
+import pandas as pd
+from contextlib import closing
+
+# Base de datos SQLite local (modo WAL) para inventario, ventas e historial
+DB_FILE = "ferreteria.db"
+
+# Columnas en SQLite (sin acentos) y su nombre en los dataframes de la aplicación
+COLUMNAS_INVENTARIO = {
+    "id": "ID", "producto": "Producto", "categoria": "Categoría", "cantidad": "Cantidad",
+    "precio": "Precio", "proveedor": "Proveedor", "ultima_actualizacion": "Última Actualización",
+    "demanda_estimada": "Demanda Estimada"
+}
+COLUMNAS_VENTAS = {
+    "fecha": "Fecha", "id": "ID", "producto": "Producto", "cantidad_vendida": "Cantidad Vendida",
+    "precio_unitario": "Precio Unitario", "total": "Total", "usuario": "Usuario"
+}
+COLUMNAS_HISTORIAL = {"fecha": "Fecha", "accion": "Acción", "id_producto": "ID Producto", "usuario": "Usuario"}
+COLUMNAS_AGREGADOS = {"dia": "Día", "id": "ID", "usuario": "Usuario", "ventas": "Ventas", "cantidad": "Cantidad", "total": "Total"}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS inventario (
+    id TEXT PRIMARY KEY,
+    producto TEXT NOT NULL,
+    categoria TEXT,
+    cantidad INTEGER NOT NULL CHECK (cantidad >= 0),
+    precio REAL NOT NULL,
+    proveedor TEXT,
+    ultima_actualizacion TEXT,
+    demanda_estimada REAL NOT NULL DEFAULT 0.0
+);
+CREATE TABLE IF NOT EXISTS ventas (
+    fecha TEXT NOT NULL,
+    id TEXT NOT NULL,
+    producto TEXT,
+    cantidad_vendida INTEGER NOT NULL,
+    precio_unitario REAL NOT NULL,
+    total REAL NOT NULL,
+    usuario TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas (fecha);
+CREATE INDEX IF NOT EXISTS idx_ventas_id ON ventas (id);
+CREATE TABLE IF NOT EXISTS ventas_diarias (
+    dia TEXT NOT NULL,
+    id TEXT NOT NULL,
+    usuario TEXT NOT NULL DEFAULT '',
+    ventas INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (dia, id, usuario)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS historial (
+    fecha TEXT NOT NULL,
+    accion TEXT NOT NULL,
+    id_producto TEXT,
+    usuario TEXT
+);
+"""
+
+_esquemas_creados = set()
+
+# Abrir una conexión; el esquema se crea una sola vez por proceso
+def conectar():
+    conexion = sqlite3.connect(DB_FILE, timeout=30)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA synchronous=NORMAL")
+    if DB_FILE not in _esquemas_creados:
+        conexion.executescript(ESQUEMA)
+        # Bases creadas antes de existir ventas_diarias: calcular los agregados una vez
+        if conexion.execute("SELECT EXISTS (SELECT 1 FROM ventas) AND NOT EXISTS (SELECT 1 FROM ventas_diarias)").fetchone()[0]:
+            with conexion:
+                _reconstruir_agregados(conexion)
+        _esquemas_creados.add(DB_FILE)
+    return conexion
+
+# Agregados por día, producto y usuario; ventas_diarias se mantiene en la misma transacción que ventas
+AGREGAR_VENTA = """
+INSERT INTO ventas_diarias (dia, id, usuario, ventas, cantidad, total) VALUES (substr(?, 1, 10), ?, coalesce(?, ''), 1, ?, ?)
+ON CONFLICT (dia, id, usuario) DO UPDATE SET
+    ventas = ventas + 1, cantidad = cantidad + excluded.cantidad, total = round(total + excluded.total, 2)
+"""
+
+def _reconstruir_agregados(conexion):
+    conexion.execute("DELETE FROM ventas_diarias")
+    conexion.execute("INSERT INTO ventas_diarias (dia, id, usuario, ventas, cantidad, total) "
+                     "SELECT substr(fecha, 1, 10), id, coalesce(usuario, ''), COUNT(*), SUM(cantidad_vendida), round(SUM(total), 2) "
+                     "FROM ventas GROUP BY 1, 2, 3")
+
+def _select(tabla, columnas, sufijo=""):
+    campos = ", ".join(f'{col} AS "{nombre}"' for col, nombre in columnas.items())
+    return f"SELECT {campos} FROM {tabla} {sufijo}"
+
+def _insert(tabla, columnas):
+    return f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' for _ in columnas)})"
+
+# Filas para executemany: fechas como texto y valores faltantes como NULL
+def _filas(df, columnas):
+    df = df[list(columnas.values())]
+    df = df.assign(**{col: df[col].dt.strftime("%Y-%m-%d %H:%M:%S") for col in df.columns if pd.api.types.is_datetime64_any_dtype(df[col])})
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+# Indica si la base de datos ya tiene datos (para decidir si migrar desde CSV)
+def esta_vacia():
+    with closing(conectar()) as conexion:
+        return conexion.execute("SELECT NOT EXISTS (SELECT 1 FROM inventario) AND NOT EXISTS (SELECT 1 FROM ventas)").fetchone()[0] == 1
+
+# Función para cargar inventario
+def cargar_inventario():
+    with closing(conectar()) as conexion:
+        df = pd.read_sql_query(_select("inventario", COLUMNAS_INVENTARIO, "ORDER BY rowid"), conexion)
+    df["Precio"] = df["Precio"].round(2)
+    return df
+
+# Función para guardar inventario: reemplaza todo el inventario en una transacción
+def guardar_inventario(df):
+    with closing(conectar()) as conexion, conexion:
+        conexion.execute("DELETE FROM inventario")
+        conexion.executemany(_insert("inventario", COLUMNAS_INVENTARIO), _filas(df, COLUMNAS_INVENTARIO))
+
+# Reabastecer en una transacción: suma cantidades a los IDs existentes (y opcionalmente actualiza
+# sus precios), inserta los nuevos y registra el historial. Devuelve (IDs existentes, IDs nuevos).
+def reabastecer(entrega, usuario, actualizar_precios, fecha):
+    filas = _filas(entrega, COLUMNAS_INVENTARIO)
+    with closing(conectar()) as conexion, conexion:
+        conexion.execute("CREATE TEMP TABLE IF NOT EXISTS entrega_ids (id TEXT PRIMARY KEY)")
+        conexion.execute("DELETE FROM entrega_ids")
+        conexion.executemany("INSERT INTO entrega_ids (id) VALUES (?)", [(fila[0],) for fila in filas])
+        existentes = {fila[0] for fila in conexion.execute("SELECT id FROM inventario WHERE id IN (SELECT id FROM entrega_ids)")}
+        conexion.executemany(
+            _insert("inventario", COLUMNAS_INVENTARIO) + " ON CONFLICT (id) DO UPDATE SET "
+            "cantidad = cantidad + excluded.cantidad, ultima_actualizacion = ?, "
+            "precio = CASE WHEN ? THEN excluded.precio ELSE precio END",
+            [fila + [fecha, actualizar_precios] for fila in filas])
+        ids_existentes = [fila[0] for fila in filas if fila[0] in existentes]
+        ids_nuevos = [fila[0] for fila in filas if fila[0] not in existentes]
+        conexion.executemany(_insert("historial", COLUMNAS_HISTORIAL),
+                             [(fecha, "Reabastecer", id_prod, usuario) for id_prod in ids_existentes] +
+                             [(fecha, "Agregar", id_prod, usuario) for id_prod in ids_nuevos])
+    return ids_existentes, ids_nuevos
+
+# Actualizar un solo producto; valores usa los nombres de columna de la aplicación
+def actualizar_producto(id_producto, valores):
+    columnas = {nombre: col for col, nombre in COLUMNAS_INVENTARIO.items()}
+    asignaciones = ", ".join(f"{columnas[nombre]} = ?" for nombre in valores)
+    with closing(conectar()) as conexion, conexion:
+        conexion.execute(f"UPDATE inventario SET {asignaciones} WHERE id = ?", list(valores.values()) + [id_producto])
+
+def eliminar_producto(id_producto):
+    with closing(conectar()) as conexion, conexion:
+        conexion.execute("DELETE FROM inventario WHERE id = ?", (id_producto,))
+
+# Guardar la demanda estimada sin reescribir el resto del inventario
+def actualizar_demanda(demandas):
+    with closing(conectar()) as conexion, conexion:
+        conexion.executemany("UPDATE inventario SET demanda_estimada = ? WHERE id = ?",
+                             [(round(float(demanda), 2), id_producto) for id_producto, demanda in demandas.items()])
+
+# Vender: descuenta stock, registra las ventas ([(ID, cantidad)]) y el historial en una sola
+# transacción. Devuelve las ventas registradas o lanza ValueError (y no vende nada) si un ID no
+# existe o no hay stock suficiente.
+def vender(ventas, usuario, fecha):
+    pedidas = {}
+    for id_producto, cantidad in ventas:
+        pedidas[id_producto] = pedidas.get(id_producto, 0) + int(cantidad)
+    with closing(conectar()) as conexion:
+        conexion.execute("BEGIN IMMEDIATE")  # Bloquea escrituras concurrentes hasta confirmar
+        try:
+            productos = {}
+            for id_producto, cantidad in pedidas.items():
+                fila = conexion.execute("SELECT producto, precio, cantidad FROM inventario WHERE id = ?", (id_producto,)).fetchone()
+                if fila is None:
+                    raise ValueError(f"El ID '{id_producto}' no se encontró en el inventario.")
+                if fila[2] < cantidad:
+                    raise ValueError(f"No hay suficiente stock de '{id_producto}'. Disponible: {fila[2]}")
+                productos[id_producto] = fila
+            conexion.executemany("UPDATE inventario SET cantidad = cantidad - ?, ultima_actualizacion = ? WHERE id = ?",
+                                 [(cantidad, fecha, id_producto) for id_producto, cantidad in pedidas.items()])
+            filas = [[fecha, id_producto, productos[id_producto][0], int(cantidad), round(productos[id_producto][1], 2),
+                      round(cantidad * productos[id_producto][1], 2), usuario] for id_producto, cantidad in ventas]
+            conexion.executemany(_insert("ventas", COLUMNAS_VENTAS), filas)
+            conexion.executemany(AGREGAR_VENTA, [(fecha, fila[1], usuario, fila[3], fila[5]) for fila in filas])
+            conexion.executemany(_insert("historial", COLUMNAS_HISTORIAL), [(fecha, "Venta", fila[1], usuario) for fila in filas])
+            conexion.execute("COMMIT")
+        except BaseException:
+            conexion.execute("ROLLBACK")
+            raise
+    return [dict(zip(COLUMNAS_VENTAS.values(), fila)) for fila in filas]
+
+# Función para cargar ventas
+def cargar_ventas():
+    with closing(conectar()) as conexion:
+        df = pd.read_sql_query(_select("ventas", COLUMNAS_VENTAS, "ORDER BY rowid"), conexion)
+    df["Precio Unitario"] = df["Precio Unitario"].round(2)
+    df["Total"] = df["Total"].round(2)
+    return df
+
+# Ventas entre dos días (hasta excluido), usando el índice por fecha
+def ventas_entre(desde, hasta):
+    with closing(conectar()) as conexion:
+        df = pd.read_sql_query(_select("ventas", COLUMNAS_VENTAS, "WHERE fecha >= ? AND fecha < ? ORDER BY rowid"),
+                               conexion, params=(desde, hasta))
+    df["Precio Unitario"] = df["Precio Unitario"].round(2)
+    df["Total"] = df["Total"].round(2)
+    return df
+
+def cargar_agregados():
+    with closing(conectar()) as conexion:
+        return pd.read_sql_query(_select("ventas_diarias", COLUMNAS_AGREGADOS), conexion)
+
+# Función para guardar ventas: reemplaza todo el histórico (solo para cargas masivas)
+def guardar_ventas(df):
+    with closing(conectar()) as conexion, conexion:
+        conexion.execute("DELETE FROM ventas")
+        conexion.executemany(_insert("ventas", COLUMNAS_VENTAS), _filas(df, COLUMNAS_VENTAS))
+        _reconstruir_agregados(conexion)
+
+def registrar_cambios(filas):
+    with closing(conectar()) as conexion, conexion:
+        conexion.executemany(_insert("historial", COLUMNAS_HISTORIAL), filas)
+
+def contar_cambios():
+    with closing(conectar()) as conexion:
+        return conexion.execute("SELECT COUNT(*) FROM historial").fetchone()[0]
+
+def leer_historial(pagina, tamaño_pagina=100):
+    with closing(conectar()) as conexion:
+        return pd.read_sql_query(_select("historial", COLUMNAS_HISTORIAL, "ORDER BY rowid LIMIT ? OFFSET ?"), conexion,
+                                 params=(tamaño_pagina, pagina * tamaño_pagina))
@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+# Benchmark de las operaciones principales, sin Streamlit. Genera un catálogo y un historial de
+# ventas sintéticos en un directorio temporal y mide cada operación varias veces.
+# Uso: python benchmark.py --productos 100000 --ventas 1000000 --backend sqlite --json resultados.json
+CATEGORIAS = ["Herramientas", "Pinturas", "Materiales", "Electricidad", "Plomería", "Jardinería", "Fijaciones"]
+PROVEEDORES = ["Truper", "Bosch", "Sherwin", "Voltex", "Genérico", "Stanley", "Makita", "Urrea", "Pretul"]
+ARTICULOS = ["Taladro", "Martillo", "Tornillo", "Pintura", "Cable", "Llave", "Brocha", "Clavo", "Tuerca", "Cinta",
+             "Sierra", "Destornillador", "Lija", "Pegamento", "Manguera", "Tubo", "Codo", "Foco", "Candado", "Pala"]
+VARIANTES = ["1/4", "3/8", "1/2", "10m", "20m", "Blanco", "Negro", "Rojo", "Acero", "Inox", "Pro", "Mini", "Eléctrico", "1L", "4L"]
+CONSULTAS = ["taladro", "pintura blanca", "tornillo 1/4", "cable 10m", "llave inox", "bosch", "mart", "tubo pro", "000123"]
+
+# Catálogo sintético con las columnas del inventario
+def generar_catalogo(productos, semilla=0):
+    rng = np.random.default_rng(semilla)
+    digitos = max(3, len(str(productos)))
+    articulos = rng.choice(ARTICULOS, productos)
+    variantes = rng.choice(VARIANTES, productos)
+    return pd.DataFrame({
+        "ID": [str(i).zfill(digitos) for i in range(1, productos + 1)],
+        "Producto": [f"{a} {v} {i}" for i, (a, v) in enumerate(zip(articulos, variantes))],
+        "Categoría": rng.choice(CATEGORIAS, productos),
+        "Cantidad": rng.integers(0, 500, productos),
+        "Precio": np.round(rng.lognormal(2.5, 1.0, productos), 2),
+        "Proveedor": rng.choice(PROVEEDORES, productos),
+        "Última Actualización": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "Demanda Estimada": 0.0,
+    })
+
+# Historial de ventas sintético: pocos productos venden casi a diario y la mayoría de forma
+# intermitente (popularidad con cola larga), con más ventas los fines de semana.
+def generar_ventas(catalogo, ventas, dias, semilla=0):
+    rng = np.random.default_rng(semilla)
+    popularidad = rng.pareto(1.2, len(catalogo)) + 1e-3
+    productos = rng.choice(len(catalogo), ventas, p=popularidad / popularidad.sum())
+    peso_dia = np.where((np.arange(dias) + datetime.now().weekday() - dias + 1) % 7 >= 5, 1.5, 1.0)
+    dia = rng.choice(dias, ventas, p=peso_dia / peso_dia.sum())
+    segundos = rng.integers(8 * 3600, 20 * 3600, ventas)
+    inicio = pd.Timestamp(datetime.now().date() - timedelta(days=dias - 1))
+    fechas = inicio + pd.to_timedelta(dia, unit="D") + pd.to_timedelta(segundos, unit="s")
+    cantidad = rng.geometric(0.5, ventas)
+    precio = catalogo["Precio"].to_numpy()[productos]
+    df = pd.DataFrame({
+        "Fecha": fechas.strftime("%Y-%m-%d %H:%M:%S"),
+        "ID": catalogo["ID"].to_numpy()[productos],
+        "Producto": catalogo["Producto"].to_numpy()[productos],
+        "Cantidad Vendida": cantidad,
+        "Precio Unitario": precio,
+        "Total": np.round(cantidad * precio, 2),
+        "Usuario": rng.choice(["admin", "caja1", "caja2"], ventas),
+    })
+    return df.sort_values("Fecha", kind="stable").reset_index(drop=True)
+
+# Medir una operación: los tiempos se toman sin tracemalloc (que la hace más lenta) y el pico de
+# memoria en una ejecución aparte. preparar se ejecuta antes de cada medición y no se cuenta.
+def medir(nombre, funcion, repeticiones, preparar=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    funcion()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    tiempos = np.array(tiempos)
+    return {"operacion": nombre, "repeticiones": repeticiones,
+            "p50_ms": float(np.percentile(tiempos, 50)), "p95_ms": float(np.percentile(tiempos, 95)),
+            "p99_ms": float(np.percentile(tiempos, 99)), "max_ms": float(tiempos.max()), "pico_mb": pico / 2**20}
+
+def mostrar(resultados):
+    print(f"{'Operación':<42}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'máx ms':>11}{'pico MB':>10}")
+    for r in resultados:
+        print(f"{r['operacion']:<42}{r['repeticiones']:>6}{r['p50_ms']:>11.2f}{r['p95_ms']:>11.2f}"
+              f"{r['p99_ms']:>11.2f}{r['max_ms']:>11.2f}{r['pico_mb']:>10.1f}")
+
+# Los datos se generan en un directorio temporal que se borra al terminar, salvo con --conservar
+def ejecutar(args):
+    # El backend se elige al importar almacenamiento y las rutas son relativas al directorio actual
+    os.environ["FERRETERIA_BACKEND"] = args.backend
+    anterior = os.getcwd()
+    directorio = tempfile.mkdtemp(prefix="ferreteria_benchmark_")
+    os.chdir(directorio)
+    try:
+        medir_operaciones(args)
+    finally:
+        os.chdir(anterior)
+        if args.conservar:
+            print(f"Datos conservados en {directorio}")
+        else:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+def medir_operaciones(args):
+    import almacenamiento
+    import reporte
+    from busqueda import obtener_indice, IndiceBusqueda, firma_catalogo
+    from importacion import importar_csv, descartar_preparado
+    from pronostico import descartar_pronosticos
+    from motor import calcular_demanda_estimada
+
+    print(f"Generando {args.productos} productos y {args.ventas} ventas en {args.dias} días ({os.getcwd()})")
+    catalogo = generar_catalogo(args.productos, args.semilla)
+    almacenamiento.guardar_inventario(catalogo)
+    almacenamiento.guardar_ventas(generar_ventas(catalogo, args.ventas, args.dias, args.semilla))
+    catalogo.to_csv("importar.csv", index=False)
+    rng = random.Random(args.semilla)
+    ids = catalogo["ID"].tolist()
+    vendibles = catalogo.loc[catalogo["Cantidad"] >= 250, "ID"].tolist()  # Con stock de sobra para todas las repeticiones
+    n = args.repeticiones
+    resultados = []
+
+    resultados.append(medir("cargar_inventario (sin caché)", almacenamiento.cargar_inventario, n,
+                            preparar=almacenamiento.invalidar_cache))
+    resultados.append(medir("cargar_inventario (en caché)", almacenamiento.cargar_inventario, n))
+    resultados.append(medir("cargar_agregados (sin caché)", almacenamiento.cargar_agregados, n,
+                            preparar=almacenamiento.invalidar_cache))
+    resultados.append(medir("cargar_ventas (sin caché)", almacenamiento.cargar_ventas, max(1, n // 10),
+                            preparar=almacenamiento.invalidar_cache))
+    almacenamiento.cargar_inventario()
+    almacenamiento.cargar_agregados()
+    resultados.append(medir("vender_producto", lambda: almacenamiento.vender_producto(rng.choice(vendibles), 1, "admin"), n))
+    resultados.append(medir("vender_productos (lote de 100)",
+                            lambda: almacenamiento.vender_productos([(rng.choice(vendibles), 1) for _ in range(100)], "caja1"), n))
+    resultados.append(medir("registrar_cambio", lambda: almacenamiento.registrar_cambio("Editado", rng.choice(ids), "admin"), n))
+    resultados.append(medir("ventas_del_dia", lambda: almacenamiento.ventas_del_dia(datetime.now().strftime("%Y-%m-%d")), n))
+
+    inventario = almacenamiento.cargar_inventario()
+    resultados.append(medir("índice de búsqueda (construcción)",
+                            lambda: IndiceBusqueda.construir(inventario, firma_catalogo(inventario)), max(1, n // 10)))
+    indice = obtener_indice(inventario)
+    resultados.append(medir("búsqueda", lambda: indice.buscar(rng.choice(CONSULTAS), limite=501), n))
+
+    agregados = almacenamiento.cargar_agregados()
+    # Sin pronósticos previos todos los ARIMA se ajustan de nuevo en cada repetición
+    pronosticar = lambda: calcular_demanda_estimada(agregados, inventario.copy())
+    resultados.append(medir("calcular_demanda_estimada", pronosticar, max(1, n // 20), preparar=descartar_pronosticos))
+    resultados.append(medir("calcular_demanda_estimada (reutilizado)", pronosticar, max(1, n // 20)))
+
+    def importar():
+        resultado = importar_csv("importar.csv")
+        descartar_preparado(resultado["preparado"])
+    resultados.append(medir("importar_csv", importar, max(1, n // 20)))
+
+    inventario_pdf = inventario.head(args.filas_pdf)
+    resultados.append(medir(f"generar_pdf ({len(inventario_pdf)} filas)", lambda: reporte.generar_pdf(inventario_pdf), 1))
+
+    mostrar(resultados)
+    try:
+        import resource
+        print(f"Memoria máxima del proceso: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+    except ImportError:  # No disponible en Windows
+        pass
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del sistema de inventario con datos sintéticos")
+    parser.add_argument("--productos", type=int, default=10_000)
+    parser.add_argument("--ventas", type=int, default=200_000)
+    parser.add_argument("--dias", type=int, default=730, help="Días de historial de ventas")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    parser.add_argument("--backend", choices=["csv", "sqlite", "parquet"], default="csv")
+    parser.add_argument("--filas-pdf", type=int, default=2000)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--json", help="Guardar los resultados en este archivo JSON")
+    parser.add_argument("--conservar", action="store_true", help="No borrar el directorio con los datos generados")
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    ejecutar(args)
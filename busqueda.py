@@ -0,0 +1,156 @@
+import re
+import bisect
+import heapq
+import threading
+import unicodedata
+import pandas as pd
+from collections import defaultdict
+
+# Índice invertido para "Buscar Producto": búsqueda por prefijo, sin distinguir acentos ni
+# mayúsculas, con resultados ordenados por relevancia. Un término coincide en ID más que en
+# el nombre del producto, y en el nombre más que en el proveedor.
+PESOS_CAMPOS = {"ID": 3.0, "Producto": 2.0, "Proveedor": 1.0}
+BONO_EXACTO = 1.5  # Un término que coincide con la palabra completa pesa más que un prefijo
+_PATRON_TOKEN = re.compile(r"[a-z0-9]+(?:[/.,-][a-z0-9]+)*")
+
+# Texto en minúsculas y sin acentos ("Eléctrico" -> "electrico")
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower()
+
+# Palabras de un texto; "1/4" o "2.5" se mantienen como una sola palabra
+def tokenizar(texto):
+    return _PATRON_TOKEN.findall(normalizar(texto))
+
+_firmas_por_version = {}
+
+# Firma del catálogo: cambia solo si cambian los campos indexados, no el stock ni los precios.
+# Si el inventario viene de la caché de carga (attrs["version"]), la firma se calcula una vez por versión.
+def firma_catalogo(inventario):
+    if inventario.empty:
+        return (0, 0)
+    clave = (inventario.attrs.get("version"), len(inventario))
+    # Un solo acceso al diccionario: otros hilos lo vacían al cambiar de versión
+    guardado = _firmas_por_version.get(clave) if clave[0] is not None else None
+    if guardado is not None:
+        return guardado
+    valores = pd.util.hash_pandas_object(inventario[list(PESOS_CAMPOS)], index=False)
+    firma = (len(inventario), int(valores.sum()))
+    if clave[0] is not None:
+        _firmas_por_version.clear()  # Solo interesa la versión vigente
+        _firmas_por_version[clave] = firma
+    return firma
+
+class IndiceBusqueda:
+    def __init__(self, version=None):
+        self.version = version
+        self._publicaciones = defaultdict(dict)  # palabra -> {ID: peso}
+        self._palabras_producto = {}  # ID -> {palabra: peso}, para puntuar y para poder quitarlo
+        self._vocabulario = []  # Palabras ordenadas para buscar por prefijo con bisect
+
+    @classmethod
+    def construir(cls, inventario, version=None):
+        indice = cls(version)
+        for fila in inventario[list(PESOS_CAMPOS)].astype(str).itertuples(index=False, name=None):
+            indice._indexar(dict(zip(PESOS_CAMPOS, fila)))
+        indice._vocabulario = sorted(indice._publicaciones)
+        return indice
+
+    def _indexar(self, campos):
+        id_producto = campos["ID"]
+        pesos = {}
+        for campo, peso in PESOS_CAMPOS.items():
+            for palabra in tokenizar(campos[campo]):
+                pesos[palabra] = max(pesos.get(palabra, 0.0), peso)
+        for palabra, peso in pesos.items():
+            self._publicaciones[palabra][id_producto] = peso
+        self._palabras_producto[id_producto] = pesos
+        return pesos
+
+    # Agregar o reemplazar un producto; campos es un diccionario con ID, Producto y Proveedor
+    def agregar(self, campos):
+        campos = {campo: str(campos[campo]) for campo in PESOS_CAMPOS}
+        self.eliminar(campos["ID"])
+        for palabra in self._indexar(campos):
+            posicion = bisect.bisect_left(self._vocabulario, palabra)
+            if posicion == len(self._vocabulario) or self._vocabulario[posicion] != palabra:
+                self._vocabulario.insert(posicion, palabra)
+
+    def eliminar(self, id_producto):
+        for palabra in self._palabras_producto.pop(id_producto, []):
+            publicaciones = self._publicaciones[palabra]
+            publicaciones.pop(id_producto, None)
+            if not publicaciones:
+                del self._publicaciones[palabra]
+                posicion = bisect.bisect_left(self._vocabulario, palabra)
+                del self._vocabulario[posicion]
+
+    # Palabras del vocabulario que empiezan por el término
+    def _palabras_con_prefijo(self, termino):
+        inicio = bisect.bisect_left(self._vocabulario, termino)
+        fin = inicio
+        while fin < len(self._vocabulario) and self._vocabulario[fin].startswith(termino):
+            fin += 1
+        return self._vocabulario[inicio:fin]
+
+    # Puntaje de un término en un producto (0 si ninguna de sus palabras empieza por él)
+    def _puntaje(self, termino, pesos):
+        puntaje = 0.0
+        for palabra, peso in pesos.items():
+            if palabra.startswith(termino):
+                puntaje = max(puntaje, peso * (BONO_EXACTO if palabra == termino else 1.0))
+        return puntaje
+
+    # Buscar productos que contengan todos los términos de la consulta (como prefijo de alguna palabra).
+    # Devuelve los IDs ordenados de mayor a menor relevancia.
+    def buscar(self, consulta, limite=None):
+        terminos = list(dict.fromkeys(tokenizar(consulta)))
+        if not terminos:
+            return []
+        # Los candidatos salen del término más selectivo; los demás solo se comprueban sobre ellos
+        palabras = {termino: self._palabras_con_prefijo(termino) for termino in terminos}
+        selectivo = min(terminos, key=lambda termino: sum(len(self._publicaciones[p]) for p in palabras[termino]))
+        candidatos = set()
+        for palabra in palabras[selectivo]:
+            candidatos.update(self._publicaciones[palabra])
+        puntajes = {}
+        for id_producto in candidatos:
+            pesos = self._palabras_producto[id_producto]
+            puntaje = 0.0
+            for termino in terminos:
+                puntaje_termino = self._puntaje(termino, pesos)
+                if puntaje_termino == 0.0:
+                    break
+                puntaje += puntaje_termino
+            else:
+                puntajes[id_producto] = puntaje
+        clave = lambda id_producto: (-puntajes[id_producto], id_producto)
+        if limite:
+            return heapq.nsmallest(limite, puntajes, key=clave)
+        return sorted(puntajes, key=clave)
+
+# Índice compartido entre sesiones; se reconstruye solo cuando cambia el catálogo
+_indice = None
+_indice_lock = threading.Lock()
+
+def obtener_indice(inventario):
+    global _indice
+    version = firma_catalogo(inventario)
+    with _indice_lock:
+        if _indice is None or _indice.version != version:
+            _indice = IndiceBusqueda.construir(inventario, version)
+        return _indice
+
+# Actualizar el índice compartido después de agregar, editar o eliminar productos, sin reconstruirlo.
+# anterior y nuevo son el inventario antes y después del cambio; ids, los productos afectados.
+def actualizar_indice(anterior, nuevo, ids):
+    with _indice_lock:
+        if _indice is None or _indice.version != firma_catalogo(anterior):
+            return  # El índice no corresponde al inventario anterior: se reconstruirá al buscar
+        filas = nuevo.set_index("ID", drop=False)
+        for id_producto in ids:
+            if id_producto in filas.index:
+                _indice.agregar(filas.loc[id_producto])
+            else:
+                _indice.eliminar(id_producto)
+        _indice.version = firma_catalogo(nuevo)
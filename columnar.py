@@ -0,0 +1,73 @@
+import os
+import pandas as pd
+from instrumentacion import sumar
+
+# Formato columnar opcional (FERRETERIA_BACKEND=parquet, requiere pyarrow). El inventario y las
+# ventas compactadas se guardan en Parquet con el mismo esquema que en CSV; se pueden leer solo
+# algunas columnas y, en las ventas, solo los grupos de filas de un rango de fechas. La cola de
+# ventas y el historial siguen siendo CSV de solo anexar, dentro del mismo directorio.
+DIRECTORIO = "datos_parquet"
+INVENTARIO_FILE = os.path.join(DIRECTORIO, "inventario.parquet")
+VENTAS_DIR = os.path.join(DIRECTORIO, "ventas")  # Un archivo por lote compactado, ordenado por fecha
+AGREGADOS_DIR = os.path.join(DIRECTORIO, "agregados")  # Agregados por día de cada lote
+FILAS_POR_GRUPO = 50_000  # Las estadísticas de cada grupo de filas permiten saltar fechas fuera del rango
+TIPOS_VENTAS = {"Fecha": str, "ID": str, "Producto": str, "Cantidad Vendida": "int64",
+                "Precio Unitario": "float64", "Total": "float64", "Usuario": str}
+
+# Escribir de forma atómica; el archivo temporal empieza con "." para que no se lea como parte de los datos
+def _escribir(df, ruta):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = os.path.join(os.path.dirname(ruta), f".{os.path.basename(ruta)}.tmp")
+    df.to_parquet(tmp, index=False, row_group_size=FILAS_POR_GRUPO)
+    sumar(bytes_escritos=os.path.getsize(tmp))
+    os.replace(tmp, ruta)
+
+def hay_inventario():
+    return os.path.exists(INVENTARIO_FILE)
+
+# Cargar el inventario completo o solo las columnas indicadas
+def cargar_inventario(columnas=None):
+    return pd.read_parquet(INVENTARIO_FILE, columns=columnas)
+
+def guardar_inventario(df):
+    _escribir(df.reset_index(drop=True), INVENTARIO_FILE)
+
+def _ruta(directorio, lote):
+    return os.path.join(directorio, f"{lote}.parquet")
+
+# Lotes de ventas ya compactados (el archivo de ventas del lote es el que lo marca como incluido)
+def lotes():
+    if not os.path.exists(VENTAS_DIR):
+        return set()
+    return {nombre[:-len(".parquet")] for nombre in os.listdir(VENTAS_DIR)
+            if nombre.endswith(".parquet") and not nombre.startswith(".")}
+
+# Guardar un lote de ventas con sus agregados (tabla con Día como texto)
+def escribir_lote(lote, ventas, agregados):
+    _escribir(agregados, _ruta(AGREGADOS_DIR, lote))
+    _escribir(ventas.astype(TIPOS_VENTAS).sort_values("Fecha", kind="stable"), _ruta(VENTAS_DIR, lote))
+
+# Reemplazar todas las ventas compactadas por un solo lote (cargas masivas)
+def reemplazar_ventas(lote, ventas, agregados):
+    for directorio in (VENTAS_DIR, AGREGADOS_DIR):
+        if os.path.exists(directorio):
+            for nombre in os.listdir(directorio):
+                os.remove(os.path.join(directorio, nombre))
+    escribir_lote(lote, ventas, agregados)
+
+# Ventas compactadas; con desde/hasta ("YYYY-MM-DD", hasta excluido) solo se leen las del rango
+def cargar_ventas(columnas=None, desde=None, hasta=None):
+    filtros = ([("Fecha", ">=", desde)] if desde else []) + ([("Fecha", "<", hasta)] if hasta else [])
+    if not lotes():
+        return pd.DataFrame(columns=columnas or list(TIPOS_VENTAS))
+    return pd.read_parquet(VENTAS_DIR, columns=columnas, filters=filtros or None)
+
+# Agregados de los lotes indicados, en una sola tabla (Día como texto)
+def cargar_agregados(lotes_incluidos):
+    tablas = [pd.read_parquet(_ruta(AGREGADOS_DIR, lote)) for lote in sorted(lotes_incluidos)]
+    tablas = [t for t in tablas if not t.empty]
+    if len(tablas) < 2:
+        return tablas[0] if tablas else None
+    # Un mismo día puede aparecer en dos lotes seguidos
+    return pd.concat(tablas, ignore_index=True).groupby(["Día", "ID", "Usuario"], dropna=False, as_index=False)[
+        ["Ventas", "Cantidad", "Total"]].sum()
@@ -0,0 +1,143 @@
+import os
+import time
+import atexit
+import pickle
+import shutil
+import tempfile
+import threading
+import pandas as pd
+
+# Importación de inventario desde CSV por bloques: cada bloque se valida de forma vectorizada,
+# los errores se reúnen por fila y el resultado validado queda preparado en disco para que
+# "Confirmar" lo guarde sin volver a leer el archivo.
+COLUMNAS_OBLIGATORIAS = ["ID", "Producto", "Categoría", "Cantidad", "Precio", "Proveedor", "Última Actualización"]
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+TAMAÑO_BLOQUE = 50_000
+FILAS_MUESTRA = 100
+MAX_ERRORES = 10_000  # Errores detallados que se conservan para el reporte
+COLUMNAS_ERRORES = ["Fila", "Columna", "Valor", "Error"]
+MAX_EDAD_PREPARADO = 6 * 3600  # Segundos: las importaciones preparadas y nunca confirmadas se borran después
+
+# Directorio privado de las importaciones preparadas: lo crea mkdtemp (solo el usuario actual
+# puede leerlo o escribir en él, así nadie más puede cambiar un archivo antes de cargarlo) al
+# primer uso, y se borra al terminar el proceso
+_preparados = {"directorio": None}
+_preparados_lock = threading.Lock()
+
+# Validar un bloque; devuelve (bloque con tipos convertidos, lista de dataframes de errores).
+# ids_vistos acumula los IDs de bloques anteriores para detectar duplicados en todo el archivo.
+def _validar_bloque(bloque, ids_vistos):
+    errores = []
+    filas = bloque.index + 2  # Número de línea en el archivo (la 1 es el encabezado)
+
+    def agregar(mascara, columna, mensaje):
+        mascara = mascara.to_numpy(dtype=bool)
+        if mascara.any():
+            errores.append(pd.DataFrame({"Fila": filas[mascara], "Columna": columna,
+                                         "Valor": bloque[columna].to_numpy()[mascara], "Error": mensaje}))
+
+    ids = bloque["ID"].str.strip()
+    agregar(ids.isna() | (ids == ""), "ID", "El ID es obligatorio.")
+    duplicado = ids.notna() & (ids.duplicated() | ids.isin(ids_vistos))
+    agregar(duplicado, "ID", "ID duplicado en el archivo.")
+    ids_vistos.update(ids.dropna())
+
+    cantidad = pd.to_numeric(bloque["Cantidad"], errors="coerce")
+    agregar(cantidad.isna() | (cantidad % 1 != 0), "Cantidad", "'Cantidad' debe ser un número entero.")
+    agregar(cantidad < 0, "Cantidad", "La columna 'Cantidad' no puede contener valores negativos.")
+
+    precio = pd.to_numeric(bloque["Precio"], errors="coerce")
+    agregar(precio.isna(), "Precio", "'Precio' debe ser un número.")
+    agregar(precio < 0, "Precio", "La columna 'Precio' no puede contener valores negativos.")
+
+    fechas = pd.to_datetime(bloque["Última Actualización"], format=FORMATO_FECHA, errors="coerce")
+    agregar(fechas.isna(), "Última Actualización", "'Última Actualización' debe tener el formato YYYY-MM-DD HH:MM:SS.")
+
+    if "Demanda Estimada" in bloque.columns:
+        demanda = pd.to_numeric(bloque["Demanda Estimada"], errors="coerce")
+        agregar(bloque["Demanda Estimada"].notna() & demanda.isna(), "Demanda Estimada", "'Demanda Estimada' debe ser un número.")
+    else:
+        demanda = pd.Series(0.0, index=bloque.index)
+
+    validado = pd.DataFrame({
+        "ID": ids,
+        "Producto": bloque["Producto"],
+        "Categoría": bloque["Categoría"],
+        "Cantidad": cantidad.fillna(0).astype("int64"),
+        "Precio": precio.round(2),
+        "Proveedor": bloque["Proveedor"],
+        "Última Actualización": bloque["Última Actualización"],
+        "Demanda Estimada": demanda.fillna(0.0).round(2)
+    })
+    return validado, errores
+
+# Leer y validar un CSV por bloques. Devuelve un diccionario con:
+#   error: mensaje si el archivo no se puede usar (p. ej. faltan columnas), si no None
+#   errores: dataframe con los errores por fila (hasta MAX_ERRORES) y total_errores
+#   filas, muestra (primeras FILAS_MUESTRA filas) y preparado (ruta del resultado validado)
+def importar_csv(archivo, tamaño_bloque=TAMAÑO_BLOQUE):
+    resultado = {"error": None, "errores": pd.DataFrame(columns=COLUMNAS_ERRORES), "total_errores": 0,
+                 "filas": 0, "muestra": None, "preparado": None}
+    bloques, errores, ids_vistos = [], [], set()
+    lector = pd.read_csv(archivo, dtype=str, keep_default_na=False, na_values=[""], chunksize=tamaño_bloque)
+    for bloque in lector:
+        faltantes = [col for col in COLUMNAS_OBLIGATORIAS if col not in bloque.columns]
+        if faltantes:
+            resultado["error"] = f"El CSV debe contener las columnas obligatorias: {', '.join(COLUMNAS_OBLIGATORIAS)}."
+            return resultado
+        validado, errores_bloque = _validar_bloque(bloque, ids_vistos)
+        for error in errores_bloque:
+            resultado["total_errores"] += len(error)
+            if sum(len(e) for e in errores) < MAX_ERRORES:
+                errores.append(error)
+        if resultado["total_errores"] == 0:
+            bloques.append(validado)  # Si ya hay errores no se prepara nada, solo se sigue reportando
+
+    if errores:
+        resultado["errores"] = pd.concat(errores, ignore_index=True).sort_values("Fila", kind="stable").head(MAX_ERRORES)
+        return resultado
+    if not bloques:
+        raise pd.errors.EmptyDataError("El archivo CSV no tiene filas.")
+    validado = pd.concat(bloques, ignore_index=True)
+    resultado["filas"] = len(validado)
+    resultado["muestra"] = validado.head(FILAS_MUESTRA)
+    resultado["preparado"] = _preparar(validado)
+    return resultado
+
+def _directorio_preparados():
+    with _preparados_lock:
+        if _preparados["directorio"] is None:
+            _preparados["directorio"] = tempfile.mkdtemp(prefix="ferreteria_importaciones_")
+            atexit.register(shutil.rmtree, _preparados["directorio"], ignore_errors=True)
+        return _preparados["directorio"]
+
+# Borrar las importaciones abandonadas (el archivo se subió pero nunca se confirmó ni se reemplazó)
+def _descartar_abandonados(directorio):
+    limite = time.time() - MAX_EDAD_PREPARADO
+    for entrada in os.scandir(directorio):
+        try:
+            if entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+        except FileNotFoundError:
+            pass
+
+# Guardar el resultado validado en un archivo temporal hasta que se confirme la carga
+def _preparar(df):
+    directorio = _directorio_preparados()
+    _descartar_abandonados(directorio)
+    descriptor, ruta = tempfile.mkstemp(suffix=".pkl", dir=directorio)
+    with os.fdopen(descriptor, "wb") as f:
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return ruta
+
+# Leer una importación preparada; solo se aceptan archivos del directorio privado de este proceso
+def leer_preparado(ruta):
+    if os.path.dirname(os.path.abspath(ruta)) != _preparados["directorio"]:
+        raise ValueError("La importación preparada no pertenece a esta sesión; vuelva a cargar el archivo.")
+    with open(ruta, "rb") as f:
+        return pickle.load(f)
+
+# Borrar una importación preparada (después de confirmarla o si se reemplaza el archivo)
+def descartar_preparado(ruta):
+    if ruta and os.path.exists(ruta):
+        os.remove(ruta)
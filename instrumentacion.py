@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import itertools
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+import pandas as pd
+
+# Instrumentación de las rutas críticas: cada operación medida deja un tramo (span) con su
+# duración, el tramo que la contiene y datos como filas procesadas y bytes leídos o escritos.
+# Los tramos se guardan en memoria (los últimos MAX_TRAMOS) y se pueden ver en el panel de
+# tiempos de la aplicación o exportar como JSON, una línea por tramo.
+# FERRETERIA_INSTRUMENTACION=0 la desactiva.
+ACTIVA = os.environ.get("FERRETERIA_INSTRUMENTACION", "1") != "0"
+MAX_TRAMOS = 10_000
+
+_tramos = deque(maxlen=MAX_TRAMOS)
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_local = threading.local()  # Pila de tramos abiertos de cada hilo
+
+def _pila():
+    if not hasattr(_local, "pila"):
+        _local.pila = []
+    return _local.pila
+
+# Abrir un tramo; se cierra con terminar(). Para bloques de código es más cómodo usar tramo().
+# Con raiz=True se descartan los tramos que quedaron abiertos en este hilo (p. ej. de una
+# ejecución de la página que se interrumpió).
+def iniciar(nombre, raiz=False, **datos):
+    pila = _pila()
+    if raiz:
+        pila.clear()
+    registro = {**datos, "id": next(_ids), "padre": pila[-1]["id"] if pila else None, "nombre": nombre,
+                "inicio": time.time(), "hilo": threading.current_thread().name}
+    registro["_reloj"] = time.perf_counter()
+    if ACTIVA:
+        pila.append(registro)
+    return registro
+
+def terminar(registro, error=None):
+    registro["ms"] = round((time.perf_counter() - registro.pop("_reloj")) * 1000, 3)
+    if error is not None:
+        registro["error"] = error
+    if not ACTIVA:
+        return
+    pila = _pila()
+    for posicion in range(len(pila) - 1, -1, -1):
+        if pila[posicion] is registro:
+            del pila[posicion:]  # También descarta tramos internos que no se cerraron
+            break
+    with _lock:
+        _tramos.append(registro)
+
+@contextmanager
+def tramo(nombre, **datos):
+    registro = iniciar(nombre, **datos)
+    try:
+        yield registro
+    except BaseException as e:
+        terminar(registro, type(e).__name__)
+        raise
+    terminar(registro)
+
+# Decorador: mide cada llamada a la función; si devuelve un dataframe se anotan sus filas
+def instrumentar(nombre=None):
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with tramo(nombre or funcion.__name__) as registro:
+                resultado = funcion(*args, **kwargs)
+                if isinstance(resultado, pd.DataFrame):
+                    registro.setdefault("filas", len(resultado))
+                return resultado
+        return envoltura
+    return decorador
+
+# Agregar datos al tramo abierto más interno (p. ej. bytes_leidos); si no hay ninguno no hace nada
+def anotar(**datos):
+    pila = _pila()
+    if pila:
+        pila[-1].update(datos)
+
+# Sumar cantidades al tramo abierto más interno (p. ej. varias escrituras en una operación)
+def sumar(**cantidades):
+    pila = _pila()
+    if pila:
+        for clave, cantidad in cantidades.items():
+            pila[-1][clave] = pila[-1].get(clave, 0) + cantidad
+
+# Registrar un tramo medido en otro lugar (p. ej. un ajuste hecho en otro proceso)
+def registrar(nombre, ms, **datos):
+    pila = _pila()
+    registro = {**datos, "id": next(_ids), "padre": pila[-1]["id"] if pila else None, "nombre": nombre,
+                "inicio": time.time() - ms / 1000, "hilo": threading.current_thread().name, "ms": round(ms, 3)}
+    if ACTIVA:
+        with _lock:
+            _tramos.append(registro)
+
+# Tramos registrados, del más antiguo al más reciente; con raiz solo ese tramo y sus descendientes
+def tramos(raiz=None):
+    with _lock:
+        lista = list(_tramos)
+    if raiz is None:
+        return lista
+    incluidos = {raiz}
+    for registro in sorted(lista, key=lambda r: r["id"]):
+        if registro["padre"] in incluidos:
+            incluidos.add(registro["id"])
+    return [registro for registro in lista if registro["id"] in incluidos]
+
+# Resumen por nombre: llamadas, tiempo total y percentiles, filas y bytes
+def resumen(lista=None):
+    df = pd.DataFrame(tramos() if lista is None else lista)
+    if df.empty:
+        return pd.DataFrame(columns=["nombre", "llamadas", "total_ms", "p50_ms", "p95_ms", "max_ms"])
+    for columna in ["filas", "bytes_leidos", "bytes_escritos"]:
+        if columna not in df.columns:
+            df[columna] = 0
+    grupos = df.groupby("nombre")
+    tabla = grupos["ms"].agg(llamadas="size", total_ms="sum", p50_ms="median",
+                             p95_ms=lambda ms: ms.quantile(0.95), max_ms="max")
+    tabla = tabla.join(grupos[["filas", "bytes_leidos", "bytes_escritos"]].sum())
+    return tabla.sort_values("total_ms", ascending=False).reset_index()
+
+# Exportar los tramos como JSON, una línea por tramo
+def exportar_json(lista=None):
+    return "\n".join(json.dumps(registro, ensure_ascii=False, default=str) for registro in (tramos() if lista is None else lista))
+
+def limpiar():
+    with _lock:
+        _tramos.clear()
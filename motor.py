@@ -0,0 +1,105 @@
+import argparse
+import pandas as pd
+from almacenamiento import (cargar_inventario, cargar_agregados, vender_productos, reabastecer, actualizar_demanda)
+from importacion import importar_csv, leer_preparado, descartar_preparado
+from pronostico import pronosticar_demanda
+from instrumentacion import exportar_json
+
+# Motor del inventario sin interfaz: lo usan la aplicación de Streamlit, la línea de comandos
+# (python motor.py --help) y cualquier integración (p. ej. un punto de venta) que registre
+# ventas por lotes. statsmodels y reportlab solo se importan al pronosticar o exportar el PDF.
+
+# Calcular la demanda estimada de cada producto (modelo según su historial de ventas, ver pronostico.py).
+# Devuelve el inventario actualizado y el detalle por producto (estado, motivo y tiempo de ajuste).
+def calcular_demanda_estimada(agregados, inventario, periodos_prediccion=30):
+    resultado = pronosticar_demanda(agregados, inventario["ID"].unique(), periodos_prediccion)
+    inventario["Demanda Estimada"] = inventario["ID"].map(resultado.set_index("ID")["Demanda Estimada"]).fillna(0.0)
+    return inventario, resultado
+
+# Calcular la demanda estimada y guardarla en el inventario (lo ejecuta el recálculo en segundo plano)
+def guardar_demanda_estimada(agregados, inventario):
+    inventario, _ = calcular_demanda_estimada(agregados, inventario)
+    actualizar_demanda(dict(zip(inventario["ID"], inventario["Demanda Estimada"])))
+
+# Registrar un lote de ventas [(ID, cantidad)]: todas o ninguna (ValueError si falta un ID o stock)
+def vender(ventas, usuario):
+    return vender_productos(ventas, usuario)
+
+# Lote de ventas desde un CSV con las columnas ID y Cantidad
+def vender_desde_csv(archivo, usuario):
+    df = pd.read_csv(archivo, dtype={"ID": str})
+    if not {"ID", "Cantidad"} <= set(df.columns):
+        raise ValueError("El CSV de ventas debe contener las columnas ID y Cantidad.")
+    return vender(list(zip(df["ID"], df["Cantidad"])), usuario)
+
+# Aplicar una entrega desde un CSV con las columnas del inventario, con la misma validación
+# que la carga desde la aplicación. Devuelve el resultado de la importación con los IDs
+# reabastecidos y agregados, o con los errores si el archivo no es válido.
+def reabastecer_desde_csv(archivo, usuario, actualizar_precios=False):
+    resultado = importar_csv(archivo)
+    resultado["ids_existentes"], resultado["ids_nuevos"] = [], []
+    if resultado["error"] or resultado["total_errores"]:
+        return resultado
+    try:
+        entrega = leer_preparado(resultado["preparado"])
+        resultado["ids_existentes"], resultado["ids_nuevos"] = reabastecer(entrega, usuario, actualizar_precios)
+    finally:
+        descartar_preparado(resultado["preparado"])
+    return resultado
+
+# Pronosticar y guardar la demanda estimada de todo el inventario; devuelve el detalle por producto
+def pronosticar(periodos_prediccion=30):
+    inventario, resultado = calcular_demanda_estimada(cargar_agregados(), cargar_inventario(), periodos_prediccion)
+    actualizar_demanda(dict(zip(inventario["ID"], inventario["Demanda Estimada"])))
+    return resultado
+
+# Exportar el reporte PDF del inventario a un archivo
+def exportar_pdf(ruta):
+    from reporte import generar_pdf
+    with open(ruta, "wb") as f:
+        f.write(generar_pdf(cargar_inventario()))
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Sistema de inventario de la ferretería")
+    parser.add_argument("--usuario", default="admin")
+    parser.add_argument("--tiempos", help="Guardar los tiempos medidos en este archivo (JSON, una línea por tramo)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comando = comandos.add_parser("vender", help="Registrar un lote de ventas (CSV con ID y Cantidad)")
+    comando.add_argument("archivo")
+    comando = comandos.add_parser("reabastecer", help="Aplicar una entrega (CSV con las columnas del inventario)")
+    comando.add_argument("archivo")
+    comando.add_argument("--actualizar-precios", action="store_true")
+    comando = comandos.add_parser("pronosticar", help="Recalcular la demanda estimada")
+    comando.add_argument("--periodos", type=int, default=30)
+    comando = comandos.add_parser("reporte", help="Exportar el reporte PDF del inventario")
+    comando.add_argument("salida")
+    args = parser.parse_args(argumentos)
+
+    try:
+        if args.comando == "vender":
+            ventas = vender_desde_csv(args.archivo, args.usuario)
+            print(f"{len(ventas)} venta(s) registrada(s) por ${sum(venta['Total'] for venta in ventas):.2f}.")
+        elif args.comando == "reabastecer":
+            resultado = reabastecer_desde_csv(args.archivo, args.usuario, args.actualizar_precios)
+            if resultado["error"]:
+                parser.exit(1, f"{resultado['error']}\n")
+            if resultado["total_errores"]:
+                print(resultado["errores"].to_string(index=False))
+                parser.exit(1, f"El CSV contiene {resultado['total_errores']} error(es).\n")
+            print(f"Reabastecimiento completado: {len(resultado['ids_existentes'])} producto(s) actualizado(s) "
+                  f"y {len(resultado['ids_nuevos'])} agregado(s).")
+        elif args.comando == "pronosticar":
+            resultado = pronosticar(args.periodos)
+            print(resultado["Estado"].value_counts().to_string())
+        elif args.comando == "reporte":
+            exportar_pdf(args.salida)
+            print(f"Reporte guardado en {args.salida}.")
+    except (ValueError, FileNotFoundError, pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+        parser.exit(1, f"Error: {e}\n")
+    finally:
+        if args.tiempos:
+            with open(args.tiempos, "w", encoding="utf-8") as f:
+                f.write(exportar_json())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+import os
+import json
+import pickle
+import time
+import warnings
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from instrumentacion import instrumentar, tramo, registrar
+
+# Motor de pronóstico de demanda por niveles: modelos simples vectorizados (media móvil,
+# suavizado exponencial y Croston) para todo el catálogo, y ARIMA solo para los productos
+# más vendidos, ajustado en paralelo y de forma incremental
+ORDEN_ARIMA = (1, 1, 1)
+MIN_VENTAS = 10  # Mínimo 10 ventas para ARIMA
+MAX_ARIMA = 50  # ARIMA solo para los 50 productos más vendidos
+MIN_TAREAS_PARALELO = 16  # Con menos productos no compensa arrancar procesos
+VENTANA_DIAS = 90  # Días recientes que usan los modelos simples
+DIAS_MEDIA_MOVIL = 28
+ALFA_SUAVIZADO = 0.2
+ALFA_CROSTON = 0.1
+ADI_INTERMITENTE = 1.32  # Intervalo medio entre ventas a partir del cual la demanda es intermitente
+COLUMNAS_RESULTADO = ["ID", "Demanda Estimada", "Modelo", "Estado", "Motivo", "Segundos", "Parámetros"]
+
+# Caché persistente de pronósticos. PRONOSTICOS_FILE es un resumen pequeño (fecha, marca de
+# ventas con la que se calculó, conteos por estado y modelo) que la página lee en cada rerun;
+# el detalle por producto y los parámetros de cada modelo van en PRONOSTICOS_DETALLE_FILE y
+# solo se leen de nuevo cuando el archivo cambia.
+PRONOSTICOS_FILE = "pronosticos.json"
+PRONOSTICOS_DETALLE_FILE = "pronosticos_detalle.pkl"
+
+# Lecturas en memoria: {archivo: (mtime, tamaño, datos)}
+_lecturas = {}
+_lecturas_lock = threading.Lock()
+
+# Último ajuste por producto: {ID: {"firma": ..., "demanda": ..., "params": [...]}}.
+# Permite reutilizar pronósticos sin ventas nuevas y arrancar en caliente los que cambian.
+# Se inicializa desde PRONOSTICOS_FILE la primera vez que se pronostica.
+_ajustes_previos = None
+_calculo_lock = threading.Lock()
+
+# Recálculo en segundo plano (un solo hilo a la vez por proceso)
+_recalculo = {"hilo": None, "error": None, "iniciado": None}
+_recalculo_lock = threading.Lock()
+
+# Marca de las ventas (a partir de sus agregados por día): cambia cuando se registran ventas nuevas
+def marca_de_ventas(agregados):
+    return {"ventas": agregados.numero_ventas(), "ultima": agregados.ultimo_dia()}
+
+# Leer un archivo de la caché de pronósticos solo si cambió desde la última lectura (None si no existe)
+def _leer(ruta, lector):
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    firma = (estado.st_mtime_ns, estado.st_size)
+    with _lecturas_lock:
+        entrada = _lecturas.get(ruta)
+    if entrada is None or entrada[0] != firma:
+        entrada = (firma, lector(ruta))
+        with _lecturas_lock:
+            _lecturas[ruta] = entrada
+    return entrada[1]
+
+def _leer_json(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+def _leer_pickle(ruta):
+    with open(ruta, "rb") as f:
+        return pickle.load(f)
+
+# Leer el resumen de la caché de pronósticos; None si todavía no se calculó ninguno
+def cargar_pronosticos():
+    if not os.path.exists(PRONOSTICOS_DETALLE_FILE):
+        return None  # Sin detalle (p. ej. una caché de una versión anterior) se recalcula
+    return _leer(PRONOSTICOS_FILE, _leer_json)
+
+# Detalle por producto del último pronóstico (dataframe con COLUMNAS_RESULTADO sin Parámetros)
+def cargar_detalle_pronosticos():
+    datos = _leer(PRONOSTICOS_DETALLE_FILE, _leer_pickle)
+    return None if datos is None else datos["detalle"]
+
+# Demanda estimada del último pronóstico como serie indexada por ID
+def demanda_pronosticada():
+    datos = _leer(PRONOSTICOS_DETALLE_FILE, _leer_pickle)
+    return None if datos is None else datos["demanda"]
+
+def _escribir(ruta, contenido, modo):
+    tmp = f"{ruta}.tmp"
+    with open(tmp, modo, **({} if "b" in modo else {"encoding": "utf-8"})) as f:
+        f.write(contenido)
+    os.replace(tmp, ruta)
+
+# Guardar primero el detalle y después el resumen, que es el que marca el cálculo como terminado
+def _guardar_pronosticos(resultado, marca, periodos):
+    detalle = resultado.drop(columns="Parámetros").reset_index(drop=True)
+    modelos = {id_prod: {"firma": tuple(ajuste["firma"]), "demanda": ajuste["demanda"], "params": ajuste["params"]}
+               for id_prod, ajuste in _ajustes_previos.items()}
+    _escribir(PRONOSTICOS_DETALLE_FILE, pickle.dumps({
+        "detalle": detalle,
+        "demanda": pd.Series(detalle["Demanda Estimada"].to_numpy(), index=detalle["ID"]),
+        "modelos": modelos,
+    }, protocol=pickle.HIGHEST_PROTOCOL), "wb")
+    modelos_usados = detalle.loc[detalle["Modelo"] != "", "Modelo"].value_counts()
+    _escribir(PRONOSTICOS_FILE, json.dumps({
+        "calculado": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "marca_ventas": marca,
+        "periodos": periodos,
+        "productos": len(detalle),
+        "estados": {estado: int(n) for estado, n in detalle["Estado"].value_counts().items()},
+        "modelos": {modelo: int(n) for modelo, n in modelos_usados.items()},
+        "segundos": float(detalle["Segundos"].sum()),
+    }, ensure_ascii=False), "w")
+
+# Borrar la caché de pronósticos (archivos y ajustes en memoria): el próximo cálculo ajusta todo de nuevo
+def descartar_pronosticos():
+    global _ajustes_previos
+    with _calculo_lock:
+        for ruta in (PRONOSTICOS_FILE, PRONOSTICOS_DETALLE_FILE):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        _ajustes_previos = None
+
+def _cargar_ajustes_previos():
+    global _ajustes_previos
+    if _ajustes_previos is None:
+        datos = _leer(PRONOSTICOS_DETALLE_FILE, _leer_pickle) or {}
+        _ajustes_previos = dict(datos.get("modelos", {}))
+    return _ajustes_previos
+
+# Ventas por producto y día, tomadas de los agregados (sin recorrer ni convertir cada venta).
+# Devuelve arrays ordenados por ID (ids, días, cantidades), los límites del tramo de cada
+# producto y el número de ventas por producto.
+def _agrupar_diarias(agregados):
+    tabla = agregados.tabla()
+    dias = tabla["Día"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    diarias = pd.DataFrame({"ID": tabla["ID"].astype(str).to_numpy(), "Día": dias,
+                            "Cantidad": tabla["Cantidad"].to_numpy()}).groupby(["ID", "Día"])["Cantidad"].sum()
+    ids = diarias.index.get_level_values("ID").to_numpy()
+    dias = diarias.index.get_level_values("Día").to_numpy()
+    cantidades = diarias.to_numpy(dtype=float)
+    conteos = tabla.groupby(tabla["ID"].astype(str))["Ventas"].sum()
+    # Las filas están ordenadas por ID, así que cada producto ocupa un tramo contiguo
+    limites = np.concatenate(([0], np.flatnonzero(ids[1:] != ids[:-1]) + 1, [len(ids)]))
+    return ids, dias, cantidades, limites, conteos
+
+# Construir las series diarias de todos los productos.
+# Devuelve ({ID: array de ventas por día desde su primera venta}, {ID: firma de sus ventas}).
+def construir_series(agregados, diarias=None):
+    ids, dias, cantidades, limites, conteos = diarias if diarias is not None else _agrupar_diarias(agregados)
+    series, firmas = {}, {}
+    if len(ids) == 0:  # Sin ventas: limites queda en [0, 0] y no hay ningún tramo
+        return series, firmas
+    for inicio, fin in zip(limites[:-1], limites[1:]):
+        id_prod = ids[inicio]
+        series[id_prod] = np.bincount(dias[inicio:fin] - dias[inicio], weights=cantidades[inicio:fin])
+        firmas[id_prod] = (int(conteos[id_prod]), int(dias[fin - 1]), float(cantidades[inicio:fin].sum()))
+    return series, firmas
+
+# Matriz productos x días con las ventas de los últimos `ventana` días (hasta el día de la última venta).
+# Conviene pasar solo los productos con ventas: los demás serían filas de ceros.
+def construir_matriz(ids_productos, diarias, ventana=VENTANA_DIAS):
+    ids, dias, cantidades, _, _ = diarias
+    matriz = np.zeros((len(ids_productos), ventana), dtype=np.float32)
+    if len(dias) == 0:
+        return matriz
+    fila = pd.Index(ids_productos).get_indexer(ids)
+    columna = dias - (dias.max() - ventana + 1)
+    dentro = (fila >= 0) & (columna >= 0)
+    matriz[fila[dentro], columna[dentro]] = cantidades[dentro]
+    return matriz
+
+# Columna de la primera venta de cada producto dentro de la ventana (0 si no vendió)
+def _primera_venta(matriz):
+    return (matriz > 0).argmax(axis=1)
+
+# Modelos simples: cada uno recibe la matriz completa y devuelve la demanda diaria de todos los productos
+def media_movil(matriz, dias=DIAS_MEDIA_MOVIL):
+    return matriz[:, -dias:].mean(axis=1)
+
+# Suavizado exponencial desde la primera venta de cada producto (los días previos no cuentan como cero)
+def suavizado_exponencial(matriz, alfa=ALFA_SUAVIZADO):
+    primera = _primera_venta(matriz)
+    nivel = matriz[np.arange(matriz.shape[0]), primera].copy()
+    for t in range(1, matriz.shape[1]):
+        nivel = np.where(t > primera, nivel + alfa * (matriz[:, t] - nivel), nivel)
+    return nivel
+
+# Croston: suaviza por separado el tamaño de cada venta y el intervalo entre ventas.
+# El primer intervalo es el que hay entre la primera y la segunda venta, no desde el inicio de la ventana.
+def croston(matriz, alfa=ALFA_CROSTON):
+    n = matriz.shape[0]
+    tamaño, intervalo = np.zeros(n), np.ones(n)
+    desde_ultima = np.ones(n)
+    iniciado = np.zeros(n, dtype=bool)
+    con_intervalo = np.zeros(n, dtype=bool)
+    for t in range(matriz.shape[1]):
+        venta = matriz[:, t] > 0
+        primera, segunda, siguiente = venta & ~iniciado, venta & iniciado & ~con_intervalo, venta & con_intervalo
+        tamaño[primera] = matriz[primera, t]
+        tamaño[segunda | siguiente] += alfa * (matriz[segunda | siguiente, t] - tamaño[segunda | siguiente])
+        intervalo[segunda] = desde_ultima[segunda]
+        intervalo[siguiente] += alfa * (desde_ultima[siguiente] - intervalo[siguiente])
+        con_intervalo |= segunda
+        iniciado |= venta
+        desde_ultima = np.where(venta, 1, desde_ultima + 1)
+    return np.where(iniciado, tamaño / intervalo, 0.0)
+
+# Elegir y calcular el modelo simple de cada producto según su patrón de ventas.
+# El intervalo medio entre ventas (ADI) se mide desde la primera venta de cada producto en la
+# ventana, así un producto nuevo que vende a diario no se trata como intermitente.
+# Devuelve (demanda, nombre del modelo) por producto.
+def pronostico_base(matriz):
+    dias_con_venta = (matriz > 0).sum(axis=1)
+    adi = (matriz.shape[1] - _primera_venta(matriz)) / np.maximum(dias_con_venta, 1)
+    modelo = np.where(dias_con_venta < 3, "Media móvil", np.where(adi >= ADI_INTERMITENTE, "Croston", "Suavizado exponencial"))
+    demanda = np.select([modelo == "Media móvil", modelo == "Croston"],
+                        [media_movil(matriz), croston(matriz)], suavizado_exponencial(matriz))
+    return demanda, modelo
+
+# Ajustar ARIMA para un producto (se ejecuta en un proceso del pool)
+def _ajustar_arima(tarea):
+    id_prod, serie, periodos, params_previos = tarea
+    inicio = time.perf_counter()
+    from statsmodels.tsa.arima.model import ARIMA  # Importación diferida: solo la pagan los procesos que ajustan
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            modelo = ARIMA(serie, order=ORDEN_ARIMA)
+            if params_previos is not None and len(params_previos) == len(modelo.start_params):
+                resultado = modelo.fit(start_params=params_previos)
+            else:
+                resultado = modelo.fit()
+            demanda = float(np.mean(resultado.forecast(steps=periodos)))
+        return [id_prod, demanda, "ajustado", "", time.perf_counter() - inicio, [float(p) for p in resultado.params]]
+    except ValueError as e:
+        return [id_prod, 0.0, "omitido", f"Datos insuficientes o inadecuados: {e}", time.perf_counter() - inicio, None]
+    except Exception as e:
+        return [id_prod, 0.0, "error", f"Error inesperado: {e}", time.perf_counter() - inicio, None]
+
+def _ejecutar(tareas, procesos):
+    if procesos == 1 or len(tareas) < MIN_TAREAS_PARALELO:
+        return [_ajustar_arima(tarea) for tarea in tareas]
+    procesos = procesos or os.cpu_count() or 1
+    # "spawn" evita heredar los hilos del servidor de Streamlit en los procesos hijos
+    try:
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn")) as pool:
+            return list(pool.map(_ajustar_arima, tareas, chunksize=max(1, len(tareas) // (procesos * 4))))
+    except (OSError, BrokenProcessPool):
+        # Sin posibilidad de crear procesos (p. ej. entornos restringidos) se ajusta en este proceso
+        return [_ajustar_arima(tarea) for tarea in tareas]
+
+# Pronosticar la demanda diaria media de los próximos periodos para cada producto.
+# Los productos más vendidos usan ARIMA y solo se reajustan si tienen ventas nuevas desde el
+# último cálculo; el resto usa un modelo simple. Devuelve un dataframe con el modelo, estado
+# y tiempo de cada producto.
+@instrumentar()
+def pronosticar_demanda(agregados, ids_productos, periodos_prediccion=30, procesos=None, max_arima=MAX_ARIMA):
+    with _calculo_lock:
+        resultado = _pronosticar(agregados, ids_productos, periodos_prediccion, procesos, max_arima)
+        _guardar_pronosticos(resultado, marca_de_ventas(agregados), periodos_prediccion)
+    return resultado
+
+def _pronosticar(agregados, ids_productos, periodos_prediccion, procesos, max_arima):
+    ajustes_previos = _cargar_ajustes_previos()
+    ids_productos = [str(id_prod) for id_prod in ids_productos]
+    with tramo("series diarias") as registro:
+        diarias = _agrupar_diarias(agregados)
+        series, firmas = construir_series(agregados, diarias)
+        registro["filas"] = len(diarias[2])  # Puntos (producto, día)
+
+    # Nivel 1: modelos simples para todo el catálogo en una sola operación matricial
+    # (solo los productos con ventas: los demás se omiten y no ocupan memoria)
+    vendidos = [id_prod for id_prod in ids_productos if id_prod in firmas]
+    inicio = time.perf_counter()
+    with tramo("modelos simples", filas=len(vendidos)):
+        demanda_base, modelo_base = pronostico_base(construir_matriz(vendidos, diarias))
+    segundos_base = (time.perf_counter() - inicio) / max(len(vendidos), 1)
+    base = {id_prod: (float(demanda), str(modelo)) for id_prod, demanda, modelo in zip(vendidos, demanda_base, modelo_base)}
+
+    # Nivel 2: ARIMA para los productos más vendidos con historia suficiente
+    candidatos = [id_prod for id_prod in ids_productos if id_prod in firmas and firmas[id_prod][0] >= MIN_VENTAS]
+    candidatos = set(sorted(candidatos, key=lambda id_prod: firmas[id_prod][2], reverse=True)[:max_arima])
+
+    resultados, tareas = {}, []
+    for id_prod in ids_productos:
+        if id_prod not in firmas:
+            resultados[id_prod] = [id_prod, 0.0, "", "omitido", "Sin ventas registradas", 0.0, None]
+        elif id_prod not in candidatos:
+            resultados[id_prod] = [id_prod, base[id_prod][0], base[id_prod][1], "ajustado", "", segundos_base, None]
+        else:
+            firma = firmas[id_prod] + (periodos_prediccion,)
+            previo = ajustes_previos.get(id_prod)
+            if previo is not None and previo["firma"] == firma:
+                resultados[id_prod] = [id_prod, previo["demanda"], "ARIMA", "reutilizado", "Sin ventas nuevas", 0.0, previo["params"]]
+            else:
+                tareas.append((id_prod, series[id_prod], periodos_prediccion, previo["params"] if previo else None))
+
+    with tramo("ARIMA", filas=len(tareas)):
+        ajustes = _ejecutar(tareas, procesos)
+        for id_prod, _, estado, _, segundos, _ in ajustes:
+            registrar("ARIMA por producto", segundos * 1000, producto=id_prod, estado=estado)  # Medido en el proceso que ajustó
+    for id_prod, demanda, estado, motivo, segundos, params in ajustes:
+        if estado == "ajustado":
+            ajustes_previos[id_prod] = {"firma": firmas[id_prod] + (periodos_prediccion,), "demanda": demanda, "params": params}
+            resultados[id_prod] = [id_prod, demanda, "ARIMA", estado, motivo, segundos, params]
+        else:
+            # Si ARIMA no ajusta, el producto conserva el pronóstico del modelo simple
+            resultados[id_prod] = [id_prod, base[id_prod][0], base[id_prod][1], "ajustado", f"ARIMA no disponible: {motivo}", segundos, None]
+    return pd.DataFrame([resultados[id_prod] for id_prod in ids_productos], columns=COLUMNAS_RESULTADO)
+
+def _ejecutar_recalculo(funcion):
+    try:
+        funcion()
+        _recalculo["error"] = None
+    except Exception as e:
+        _recalculo["error"] = str(e)
+
+# Lanzar un recálculo de pronósticos en un hilo aparte (funcion no recibe argumentos).
+# Devuelve False si ya hay uno en curso.
+def recalcular_en_segundo_plano(funcion):
+    with _recalculo_lock:
+        if _recalculo["hilo"] is not None and _recalculo["hilo"].is_alive():
+            return False
+        _recalculo["hilo"] = threading.Thread(target=_ejecutar_recalculo, args=(funcion,), daemon=True)
+        _recalculo["iniciado"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        _recalculo["hilo"].start()
+        return True
+
+# Estado del recálculo en segundo plano: {"en_curso", "iniciado", "error"}
+def estado_recalculo():
+    hilo = _recalculo["hilo"]
+    return {"en_curso": hilo is not None and hilo.is_alive(), "iniciado": _recalculo["iniciado"], "error": _recalculo["error"]}
@@ -0,0 +1,113 @@
+import threading
+import pandas as pd
+from io import BytesIO
+from datetime import datetime
+from instrumentacion import instrumentar, anotar
+
+# Reporte PDF del inventario: se genera solo cuando se pide, en tablas de FILAS_POR_TABLA filas
+# que se paginan solas y repiten el encabezado en cada página. El PDF queda en caché por versión
+# del inventario; los catálogos grandes se generan en un hilo aparte. reportlab se importa al
+# generar el primer PDF, no al cargar la aplicación.
+FILAS_POR_TABLA = 100
+MIN_FILAS_SEGUNDO_PLANO = 5000  # Desde este tamaño el PDF se genera en segundo plano
+MARGEN = 36
+ANCHOS_COLUMNAS = {"ID": 0.08, "Producto": 0.22, "Categoría": 0.13, "Cantidad": 0.08, "Precio": 0.08,
+                   "Proveedor": 0.14, "Última Actualización": 0.17, "Demanda Estimada": 0.10}
+
+# Estilos del título y de las tablas
+def _estilos():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import TableStyle
+    titulo = ParagraphStyle(name="Title", fontSize=14, leading=16, alignment=1, spaceAfter=12)
+    tabla = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 8),
+        ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black)
+    ])
+    return titulo, tabla
+
+# Último PDF generado: {"version": ..., "pdf": bytes}; y la generación en segundo plano en curso
+_pdf = {"version": None, "pdf": None}
+_generacion = {"hilo": None, "version": None, "error": None}
+_lock = threading.Lock()
+
+# Versión del inventario: la de la caché de carga si existe; si no, un hash del contenido
+def version_inventario(inventario):
+    version = inventario.attrs.get("version")
+    if version is not None:
+        return version
+    return (len(inventario), int(pd.util.hash_pandas_object(inventario, index=False).sum()))
+
+# Filas de la tabla como texto, un bloque a la vez
+def _bloques(inventario):
+    columnas = list(inventario.columns)
+    formatos = {"Precio": "{:.2f}", "Demanda Estimada": "{:.2f}"}
+    for inicio in range(0, len(inventario), FILAS_POR_TABLA):
+        bloque = inventario.iloc[inicio:inicio + FILAS_POR_TABLA]
+        textos = [bloque[col].map(formatos[col].format) if col in formatos else bloque[col].astype(str) for col in columnas]
+        yield [columnas] + [list(fila) for fila in zip(*textos)]
+
+# Generar el PDF del inventario y devolverlo como bytes
+@instrumentar()
+def generar_pdf(inventario):
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.platypus import SimpleDocTemplate, LongTable, Paragraph
+    estilo_titulo, estilo_tabla = _estilos()
+    buffer = BytesIO()
+    tamaño = landscape(letter)
+    doc = SimpleDocTemplate(buffer, pagesize=tamaño, leftMargin=MARGEN, rightMargin=MARGEN,
+                            topMargin=MARGEN, bottomMargin=MARGEN)
+    ancho = tamaño[0] - 2 * MARGEN
+    # Anchos fijos: reportlab no tiene que medir cada celda para calcular las columnas
+    anchos = [ANCHOS_COLUMNAS.get(col, 0.1) * ancho for col in inventario.columns]
+    elementos = [Paragraph(f"Reporte de Inventario - {datetime.now().strftime('%Y-%m-%d %H:%M')}", estilo_titulo)]
+    for datos in _bloques(inventario):
+        elementos.append(LongTable(datos, colWidths=anchos, repeatRows=1, style=estilo_tabla))
+    doc.build(elementos)
+    anotar(filas=len(inventario), bytes_escritos=buffer.tell())
+    return buffer.getvalue()
+
+# PDF en caché para esta versión del inventario, o None si todavía no se generó
+def pdf_en_cache(version):
+    with _lock:
+        return _pdf["pdf"] if _pdf["version"] == version else None
+
+def _generar(inventario, version):
+    pdf = generar_pdf(inventario)
+    with _lock:
+        _pdf["version"], _pdf["pdf"] = version, pdf
+    return pdf
+
+def _ejecutar_generacion(inventario, version):
+    try:
+        _generar(inventario, version)
+        _generacion["error"] = None
+    except Exception as e:
+        _generacion["error"] = str(e)
+
+# Obtener el PDF: si está en caché se devuelve; si el inventario es chico se genera aquí mismo;
+# si es grande se lanza la generación en un hilo aparte y se devuelve None.
+def obtener_pdf(inventario, version=None):
+    version = version if version is not None else version_inventario(inventario)
+    pdf = pdf_en_cache(version)
+    if pdf is not None:
+        return pdf
+    if len(inventario) < MIN_FILAS_SEGUNDO_PLANO:
+        return _generar(inventario, version)
+    with _lock:
+        if _generacion["hilo"] is None or not _generacion["hilo"].is_alive():
+            _generacion["version"] = version
+            _generacion["hilo"] = threading.Thread(target=_ejecutar_generacion, args=(inventario, version), daemon=True)
+            _generacion["hilo"].start()
+    return None
+
+# Estado de la generación en segundo plano: {"en_curso", "version", "error"}
+def estado_generacion():
+    hilo = _generacion["hilo"]
+    return {"en_curso": hilo is not None and hilo.is_alive(), "version": _generacion["version"], "error": _generacion["error"]}
@@ -0,0 +1,54 @@
+import os
+import pandas as pd
+import pytest
+import almacenamiento
+
+@pytest.fixture(params=[".parquet", ".csv.gz"])
+def directorio(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(almacenamiento, "BACKEND", "csv")
+    monkeypatch.setattr(almacenamiento, "EXTENSION_PARTICION", request.param)
+    almacenamiento.invalidar_cache()
+    yield tmp_path
+    almacenamiento.invalidar_cache()
+
+def _venta(fecha, id_producto, cantidad):
+    return (fecha, id_producto, f"Producto {id_producto}", cantidad, 10.0, "admin")
+
+# El histórico compactado queda en un archivo por mes, sin pickles de ventas; al compactar solo
+# se reescriben los meses que reciben ventas nuevas
+def test_particiones_por_mes(directorio):
+    almacenamiento.guardar_ventas(almacenamiento.DEMO_VENTAS.copy())  # Febrero y marzo de 2025
+    marzo = almacenamiento._leer_manifiesto()["particiones"]["2025-03"]
+    almacenamiento.registrar_ventas([_venta("2025-02-20 10:00:00", "001", 1), _venta("2026-10-17 09:00:00", "002", 2)])
+    almacenamiento.compactar_ventas()
+
+    manifiesto = almacenamiento._leer_manifiesto()
+    assert sorted(manifiesto["particiones"]) == ["2025-02", "2025-03", "2026-10"]
+    assert manifiesto["particiones"]["2025-03"] == marzo
+    assert all(nombre.endswith(almacenamiento.EXTENSION_PARTICION) for nombre in manifiesto["particiones"].values())
+    archivos = set(os.listdir(almacenamiento.VENTAS_COMPACTADAS_DIR))
+    assert archivos == set(manifiesto["particiones"].values()) | {manifiesto["agregados"], "manifiesto.json"}
+
+    almacenamiento.invalidar_cache()
+    ventas = almacenamiento.cargar_ventas()
+    assert len(ventas) == len(almacenamiento.DEMO_VENTAS) + 2
+    assert ventas["Fecha"].is_monotonic_increasing
+    assert almacenamiento.cargar_agregados().resumen_dia("2025-02-20")["Ventas"] == 6
+
+# Los agregados guardados son solo una caché: si no se pueden leer se recalculan desde las ventas
+def test_agregados_ilegibles(directorio):
+    almacenamiento.guardar_ventas(almacenamiento.DEMO_VENTAS.copy())
+    ruta = os.path.join(almacenamiento.VENTAS_COMPACTADAS_DIR, almacenamiento._leer_manifiesto()["agregados"])
+    with open(ruta, "wb") as f:
+        f.write(b"no es un pickle")
+    almacenamiento.invalidar_cache()
+    esperado = almacenamiento.AgregadosVentas.desde_ventas(almacenamiento.DEMO_VENTAS)
+    assert almacenamiento.cargar_agregados().numero_ventas() == esperado.numero_ventas()
+    almacenamiento.registrar_ventas([_venta("2025-03-02 15:00:00", "003", 1)])
+    almacenamiento.compactar_ventas()
+    almacenamiento.invalidar_cache()
+    assert almacenamiento.cargar_agregados().resumen_dia("2025-03-02")["Ventas"] == 6
+    pd.testing.assert_series_equal(almacenamiento.cargar_ventas()["ID"].value_counts().sort_index(),
+                                   pd.concat([almacenamiento.DEMO_VENTAS["ID"], pd.Series(["003"], name="ID")]).value_counts().sort_index(),
+                                   check_dtype=False, check_index_type=False)
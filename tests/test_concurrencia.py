@@ -0,0 +1,114 @@
+import sys
+import threading
+from datetime import datetime
+import pytest
+import almacenamiento
+
+HILOS = 8
+VENTAS_POR_HILO = 400
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(almacenamiento, "BACKEND", "csv")
+    monkeypatch.setattr(almacenamiento, "UMBRAL_COMPACTACION", 20_000)  # Muchas compactaciones durante la prueba
+    almacenamiento.invalidar_cache()
+    yield tmp_path
+    almacenamiento.invalidar_cache()
+
+# Ventas anexadas por varios hilos mientras se compacta: ninguna se pierde ni falla
+def test_ventas_concurrentes_con_compactacion(directorio):
+    errores = []
+
+    def vender(hilo):
+        try:
+            for i in range(VENTAS_POR_HILO):
+                fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                almacenamiento.registrar_ventas([(fecha, f"{hilo:03d}", "Producto", 1, 1.0, f"caja{hilo}")])
+        except Exception as e:
+            errores.append(e)
+
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)  # Cambiar de hilo a menudo para que las escrituras se intercalen
+    hilos = [threading.Thread(target=vender, args=(hilo,)) for hilo in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    sys.setswitchinterval(intervalo)
+
+    assert errores == []
+    almacenamiento.invalidar_cache()
+    ventas = almacenamiento.cargar_ventas()
+    assert len(ventas) == HILOS * VENTAS_POR_HILO
+    assert (ventas["ID"].value_counts() == VENTAS_POR_HILO).all()
+    assert almacenamiento.cargar_agregados().numero_ventas() == HILOS * VENTAS_POR_HILO
+
+# Lecturas sin bloqueo (cargar_ventas, cargar_agregados) mientras otros hilos venden y compactan:
+# no fallan por archivos que la compactación mueve o borra, y no borran nada
+def test_lecturas_concurrentes_con_compactacion(directorio, monkeypatch):
+    monkeypatch.setattr(almacenamiento, "UMBRAL_COMPACTACION", 3000)
+    almacenamiento.guardar_ventas(almacenamiento.DEMO_VENTAS.head(0).copy())
+    errores = []
+    terminado = threading.Event()
+
+    def vender(hilo):
+        try:
+            for i in range(VENTAS_POR_HILO):
+                fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                almacenamiento.registrar_ventas([(fecha, f"{hilo:03d}", "Producto", 1, 1.0, f"caja{hilo}")])
+        except Exception as e:
+            errores.append(e)
+
+    def leer(lector):
+        try:
+            while not terminado.is_set():
+                almacenamiento.invalidar_cache()
+                lector()
+        except Exception as e:
+            errores.append(e)
+
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    escritores = [threading.Thread(target=vender, args=(hilo,)) for hilo in range(4)]
+    lectores = [threading.Thread(target=leer, args=(lector,)) for lector in
+                (almacenamiento.cargar_ventas, almacenamiento.cargar_agregados, almacenamiento.cargar_agregados)]
+    for hilo in escritores + lectores:
+        hilo.start()
+    for hilo in escritores:
+        hilo.join()
+    terminado.set()
+    for hilo in lectores:
+        hilo.join()
+    sys.setswitchinterval(intervalo)
+
+    assert errores == []
+    almacenamiento.invalidar_cache()
+    assert len(almacenamiento.cargar_ventas()) == 4 * VENTAS_POR_HILO
+    assert almacenamiento.cargar_agregados().numero_ventas() == 4 * VENTAS_POR_HILO
+
+# Ventas completas (inventario + cola + historial) desde varios hilos: el stock cuadra con lo vendido
+def test_vender_producto_concurrente(directorio):
+    inventario = almacenamiento.cargar_inventario()  # Crea el inventario de ejemplo
+    id_producto = inventario["ID"].iloc[0]
+    almacenamiento.actualizar_producto(id_producto, {"Cantidad": 1000})
+    ventas_previas = len(almacenamiento.cargar_ventas())
+    errores = []
+
+    def vender():
+        try:
+            for _ in range(50):
+                almacenamiento.vender_producto(id_producto, 1, "caja")
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=vender) for _ in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    almacenamiento.invalidar_cache()
+    assert almacenamiento.fila_producto(almacenamiento.cargar_inventario(), id_producto)["Cantidad"] == 1000 - HILOS * 50
+    assert len(almacenamiento.cargar_ventas()) == ventas_previas + HILOS * 50
@@ -0,0 +1,23 @@
+import pandas as pd
+import pytest
+import almacenamiento
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(almacenamiento, "BACKEND", "csv")
+    monkeypatch.setattr(almacenamiento, "PASO_INDICE_HISTORIAL", 7)  # Varias marcas con pocos registros
+    return tmp_path
+
+# Las páginas leídas con el índice de líneas coinciden con leer el archivo completo,
+# también después de anexar más registros (el índice se extiende con los bytes nuevos)
+def test_paginas_del_historial(directorio):
+    almacenamiento.registrar_cambios([("Agregado", str(i).zfill(3), "admin") for i in range(40)])
+    for _ in range(2):
+        completo = pd.read_csv(almacenamiento.HISTORIAL_FILE, dtype={"ID Producto": str})
+        assert almacenamiento.contar_cambios() == len(completo)
+        for tamaño in (1, 5, 50):
+            for pagina in range((len(completo) - 1) // tamaño + 2):
+                esperado = completo.iloc[pagina * tamaño:(pagina + 1) * tamaño].reset_index(drop=True)
+                pd.testing.assert_frame_equal(almacenamiento.leer_historial(pagina, tamaño), esperado, check_dtype=False)
+        almacenamiento.registrar_cambios([("Editado", "001", "caja1")] * 13)
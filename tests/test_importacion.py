@@ -0,0 +1,43 @@
+import io
+import os
+import stat
+import pytest
+import importacion
+
+ENCABEZADO = "ID,Producto,Categoría,Cantidad,Precio,Proveedor,Última Actualización\n"
+
+def _csv(ids):
+    return io.StringIO(ENCABEZADO + "".join(f"{i},Producto {i},Herramientas,5,1.50,Truper,2026-10-17 10:00:00\n" for i in ids))
+
+# Los IDs repetidos se detectan también entre bloques distintos
+def test_duplicados_entre_bloques():
+    resultado = importacion.importar_csv(_csv(["001", "002", "003", "001", "004", "002"]), tamaño_bloque=2)
+    assert resultado["total_errores"] == 2
+    assert resultado["errores"]["Fila"].tolist() == [5, 7]
+    assert resultado["preparado"] is None
+
+# La importación validada queda en un directorio privado y se puede leer y descartar
+def test_preparado_privado():
+    resultado = importacion.importar_csv(_csv(["001", "002"]))
+    ruta = resultado["preparado"]
+    directorio = os.path.dirname(ruta)
+    assert stat.S_IMODE(os.stat(directorio).st_mode) == 0o700
+    assert importacion.leer_preparado(ruta)["ID"].tolist() == ["001", "002"]
+    importacion.descartar_preparado(ruta)
+    assert not os.path.exists(ruta)
+
+# Solo se cargan archivos del directorio privado del proceso
+def test_preparado_ajeno(tmp_path):
+    ajeno = tmp_path / "ajeno.pkl"
+    ajeno.write_bytes(b"")
+    with pytest.raises(ValueError):
+        importacion.leer_preparado(str(ajeno))
+
+# Las importaciones que nunca se confirmaron se borran al preparar otra
+def test_descartar_abandonados():
+    abandonado = importacion.importar_csv(_csv(["001"]))["preparado"]
+    os.utime(abandonado, (0, 0))
+    reciente = importacion.importar_csv(_csv(["002"]))["preparado"]
+    assert not os.path.exists(abandonado)
+    assert os.path.exists(reciente)
+    importacion.descartar_preparado(reciente)
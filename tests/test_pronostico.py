@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from agregados import AgregadosVentas
+from pronostico import pronostico_base, pronosticar_demanda, VENTANA_DIAS
+
+# Productos cuya primera venta cae dentro de la ventana: los días previos no cuentan como intermitencia
+@pytest.mark.parametrize("inicio, paso, cantidad, esperado, modelo", [
+    (VENTANA_DIAS - 10, 1, 5, 5.0, "Suavizado exponencial"),  # 5 por día los últimos 10 días
+    (VENTANA_DIAS - 30, 3, 3, 1.0, "Croston"),  # 3 cada 3 días desde hace un mes
+    (0, 3, 3, 1.0, "Croston"),  # 3 cada 3 días toda la ventana
+    (0, 10, 2, 0.2, "Croston"),
+])
+def test_pronostico_desde_primera_venta(inicio, paso, cantidad, esperado, modelo):
+    matriz = np.zeros((1, VENTANA_DIAS), dtype=np.float32)
+    matriz[0, inicio::paso] = cantidad
+    demanda, modelos = pronostico_base(matriz)
+    assert demanda[0] == pytest.approx(esperado, rel=1e-3)
+    assert modelos[0] == modelo
+
+# Sin ninguna venta registrada todos los productos quedan con demanda 0
+def test_pronostico_sin_ventas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    resultado = pronosticar_demanda(AgregadosVentas(), ["001", "002"])
+    assert resultado["ID"].tolist() == ["001", "002"]
+    assert resultado["Demanda Estimada"].tolist() == [0.0, 0.0]
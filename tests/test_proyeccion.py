@@ -0,0 +1,39 @@
+import pytest
+import almacenamiento
+import columnar
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(almacenamiento, "BACKEND", "parquet")
+    monkeypatch.setattr(almacenamiento, "_parquet_preparado", False)
+    almacenamiento.invalidar_cache()
+    almacenamiento.guardar_inventario(almacenamiento.DEMO_DATA.copy())
+    almacenamiento.invalidar_cache()
+    yield tmp_path
+    almacenamiento.invalidar_cache()
+
+# Sin el inventario completo en caché, en Parquet se leen solo las columnas pedidas, una vez por versión
+def test_columnas_desde_parquet(directorio, monkeypatch):
+    leidas = []
+    cargar = columnar.cargar_inventario
+    monkeypatch.setattr(columnar, "cargar_inventario", lambda columnas=None: leidas.append(columnas) or cargar(columnas))
+
+    columnas = almacenamiento.cargar_inventario(["Categoría", "Cantidad"])
+    assert columnas.columns.tolist() == ["Categoría", "Cantidad"]
+    assert str(columnas["Categoría"].dtype) == "category"
+    assert almacenamiento.cargar_inventario(["Categoría", "Cantidad"]).equals(columnas)
+    assert leidas == [["Categoría", "Cantidad"]]
+
+    # Con el inventario completo al día, la proyección sale de él con la misma versión
+    completo = almacenamiento.cargar_inventario()
+    desde_completo = almacenamiento.cargar_inventario(["Categoría", "Cantidad"])
+    assert desde_completo.equals(columnas)
+    assert desde_completo.attrs["version"] == columnas.attrs["version"]
+
+    # Guardar descarta también las proyecciones
+    completo.loc[0, "Cantidad"] = 99
+    almacenamiento.guardar_inventario(completo)
+    leidas.clear()
+    assert almacenamiento.cargar_inventario(["Cantidad"])["Cantidad"].iloc[0] == 99
+    assert leidas == [["Cantidad"]]
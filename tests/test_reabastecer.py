@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+import almacenamiento
+import base_datos
+
+@pytest.fixture(params=["csv", "sqlite"])
+def directorio(request, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(almacenamiento, "BACKEND", request.param)
+    monkeypatch.setattr(almacenamiento, "_sqlite_preparado", False)
+    monkeypatch.setattr(base_datos, "_esquemas_creados", set())
+    almacenamiento.invalidar_cache()
+    almacenamiento.cargar_inventario()  # Inventario de ejemplo (en SQLite, migrado)
+    yield tmp_path
+    almacenamiento.invalidar_cache()
+
+# Entrega con dos productos existentes y dos nuevos, como la deja la importación
+def _entrega():
+    return pd.DataFrame({
+        "ID": ["002", "900", "001", "901"], "Producto": ["Pintura Blanca", "Lija", "Taladro Eléctrico", "Foco"],
+        "Categoría": ["Pinturas", "Herramientas", "Herramientas", "Electricidad"], "Cantidad": [7, 3, 10, 1],
+        "Precio": [30.0, 2.5, 199.99, 4.0], "Proveedor": ["Sherwin", "Truper", "Bosch", "Voltex"],
+        "Última Actualización": ["2026-10-17 10:00:00"] * 4, "Demanda Estimada": [0.0] * 4})
+
+# CSV y SQLite fusionan igual: suman cantidades, agregan los nuevos, actualizan precios solo si se
+# pide y registran todo el historial de la entrega en un solo lote
+@pytest.mark.parametrize("actualizar_precios", [False, True])
+def test_reabastecer(directorio, actualizar_precios):
+    antes = almacenamiento.cargar_inventario().set_index("ID")
+    cambios_previos = almacenamiento.contar_cambios()
+
+    ids_existentes, ids_nuevos = almacenamiento.reabastecer(_entrega(), "admin", actualizar_precios)
+
+    assert (ids_existentes, ids_nuevos) == (["002", "001"], ["900", "901"])
+    almacenamiento.invalidar_cache()
+    despues = almacenamiento.cargar_inventario().set_index("ID")
+    assert despues.index.tolist() == antes.index.tolist() + ["900", "901"]
+    assert despues.loc[["001", "002", "003", "900", "901"], "Cantidad"].tolist() == [
+        antes.loc["001", "Cantidad"] + 10, antes.loc["002", "Cantidad"] + 7, antes.loc["003", "Cantidad"], 3, 1]
+    precios = [199.99, 30.0] if actualizar_precios else [antes.loc["001", "Precio"], antes.loc["002", "Precio"]]
+    assert despues.loc[["001", "002", "900"], "Precio"].tolist() == pytest.approx(precios + [2.5])
+    assert (despues.loc[["001", "002"], "Última Actualización"] > antes.loc[["001", "002"], "Última Actualización"]).all()
+    assert despues.loc["003", "Última Actualización"] == antes.loc["003", "Última Actualización"]
+
+    historial = almacenamiento.leer_historial(0, 100).iloc[cambios_previos:]
+    assert list(zip(historial["Acción"], historial["ID Producto"])) == [
+        ("Reabastecer", "002"), ("Reabastecer", "001"), ("Agregar", "900"), ("Agregar", "901")]
+    assert historial["Fecha"].nunique() == 1
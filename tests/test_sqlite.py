@@ -0,0 +1,96 @@
+import sys
+import threading
+import pandas as pd
+import pytest
+import almacenamiento
+import base_datos
+
+FECHA = "2026-10-17 10:00:00"
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(almacenamiento, "BACKEND", "sqlite")
+    monkeypatch.setattr(almacenamiento, "_sqlite_preparado", False)
+    monkeypatch.setattr(base_datos, "_esquemas_creados", set())
+    almacenamiento.invalidar_cache()
+    yield tmp_path
+    almacenamiento.invalidar_cache()
+
+@pytest.fixture
+def base(directorio):
+    base_datos.guardar_inventario(almacenamiento.tipar_inventario(almacenamiento.DEMO_DATA))
+    base_datos.actualizar_producto("001", {"Cantidad": 5})
+    base_datos.actualizar_producto("002", {"Cantidad": 100})
+    return directorio
+
+def _estado():
+    inventario = base_datos.cargar_inventario().set_index("ID")["Cantidad"]
+    return (inventario.to_dict(), len(base_datos.cargar_ventas()), len(base_datos.cargar_agregados()), base_datos.contar_cambios())
+
+# Un lote válido descuenta el stock y registra ventas, agregados e historial en la misma transacción
+def test_vender_lote(base):
+    registradas = base_datos.vender([("001", 2), ("002", 3), ("001", 1)], "caja1", FECHA)
+    assert [(venta["ID"], venta["Cantidad Vendida"]) for venta in registradas] == [("001", 2), ("002", 3), ("001", 1)]
+    inventario, ventas, _, cambios = _estado()
+    assert (inventario["001"], inventario["002"]) == (2, 97)
+    assert (ventas, cambios) == (3, 3)
+    agregados = base_datos.cargar_agregados().set_index("ID")
+    assert agregados.loc["001", "Ventas"] == 2 and agregados.loc["001", "Cantidad"] == 3
+
+# Si un producto del lote no existe o no alcanza el stock (sumando sus líneas) no se vende nada
+@pytest.mark.parametrize("ventas", [
+    [("002", 1), ("001", 6)],
+    [("002", 1), ("001", 3), ("001", 3)],
+    [("002", 1), ("999", 1)],
+])
+def test_vender_todo_o_nada(base, ventas):
+    antes = _estado()
+    with pytest.raises(ValueError):
+        base_datos.vender(ventas, "caja1", FECHA)
+    assert _estado() == antes
+
+# Varios hilos vendiendo el mismo producto: nunca se vende más que el stock
+def test_vender_sin_sobreventa(base):
+    vendidas, rechazadas = [], []
+
+    def vender():
+        for _ in range(20):
+            try:
+                base_datos.vender([("002", 1)], "caja", FECHA)
+                vendidas.append(1)
+            except ValueError:
+                rechazadas.append(1)
+
+    hilos = [threading.Thread(target=vender) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert (len(vendidas), len(rechazadas)) == (100, 60)
+    assert _estado()[0]["002"] == 0
+
+# La primera carga desde varios hilos migra los CSV una sola vez
+def test_migracion_concurrente(directorio):
+    pd.DataFrame({"Fecha": [FECHA] * 50, "Acción": ["Editado"] * 50, "ID Producto": ["001"] * 50,
+                  "Usuario": ["admin"] * 50}).to_csv(almacenamiento.HISTORIAL_CSV, index=False)
+    errores = []
+
+    def cargar():
+        try:
+            almacenamiento.cargar_inventario()
+        except Exception as e:
+            errores.append(e)
+
+    intervalo = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    hilos = [threading.Thread(target=cargar) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    sys.setswitchinterval(intervalo)
+    assert errores == []
+    assert base_datos.contar_cambios() == 50
+    assert len(base_datos.cargar_inventario()) == len(almacenamiento.DEMO_DATA)
+    assert len(base_datos.cargar_ventas()) == len(almacenamiento.DEMO_VENTAS)
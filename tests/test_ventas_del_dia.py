@@ -0,0 +1,31 @@
+import pytest
+import almacenamiento
+
+@pytest.fixture
+def directorio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(almacenamiento, "BACKEND", "csv")
+    almacenamiento.invalidar_cache()
+    yield tmp_path
+    almacenamiento.invalidar_cache()
+
+def _venta(fecha, id_producto, cantidad):
+    return (fecha, id_producto, f"Producto {id_producto}", cantidad, 10.0, "admin")
+
+# Después de compactar, las ventas del día salen solo del archivo de su mes, sin cargar todo el histórico
+def test_ventas_del_dia_despues_de_compactar(directorio, monkeypatch):
+    almacenamiento.guardar_ventas(almacenamiento.DEMO_VENTAS.copy())  # Febrero y marzo de 2025
+    almacenamiento.registrar_ventas([_venta("2026-10-16 18:00:00", "001", 1), _venta("2026-10-17 09:00:00", "002", 2),
+                                     _venta("2026-10-15 12:00:00", "003", 3)])  # Llega fuera de orden
+    almacenamiento.compactar_ventas()
+    almacenamiento.registrar_ventas([_venta("2026-10-17 10:00:00", "001", 4)])
+    leidas = []
+    leer_particion = almacenamiento._leer_particion
+    monkeypatch.setattr(almacenamiento, "_leer_particion", lambda nombre: leidas.append(nombre[:7]) or leer_particion(nombre))
+    monkeypatch.setattr(almacenamiento, "_ventas_compactadas", lambda *args: pytest.fail("Se cargó todo el histórico"))
+    ventas = almacenamiento.ventas_del_dia("2026-10-17")
+    assert ventas["ID"].tolist() == ["002", "001"]
+    assert ventas["Cantidad Vendida"].tolist() == [2, 4]
+    assert almacenamiento.ventas_del_dia("2026-10-15")["ID"].tolist() == ["003"]
+    assert almacenamiento.ventas_del_dia("2026-10-14").empty
+    assert leidas == ["2026-10"]  # Una sola lectura: los demás días del mes salen de la caché